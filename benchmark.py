@@ -0,0 +1,200 @@
+"""
+성능 측정 스크립트
+사용법: python benchmark.py [ingest] [excel] [hnsw]
+"""
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import chromadb
+
+from rag_engine import RAGEngine
+from timeline_index import TimelineIndex
+
+# ---------------------------------------------------------
+# 공통 도구
+# ---------------------------------------------------------
+class FakeEmbeddings:
+    """네트워크 호출 없이 텍스트 해시로 고정 차원 벡터를 만드는 임베딩 (측정용)"""
+
+    model = "fake-embedding"
+
+    def __init__(self, dimension=1536):
+        self.dimension = dimension
+
+    def _embed(self, text):
+        seed = hashlib.sha256(text.encode("utf-8")).digest()
+        return [seed[i % len(seed)] / 255.0 for i in range(self.dimension)]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def measure(func, *args, **kwargs):
+    """함수 실행 시간(초)과 Python 힙 최대 사용량(MB)을 측정합니다."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / (1024 * 1024)
+
+
+def peak_rss_mb():
+    """현재 프로세스의 최대 RSS(MB) - ChromaDB/hnswlib 등 네이티브 메모리 포함"""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 바이트 단위
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+def run_isolated(name, *args):
+    """
+    측정을 새 프로세스에서 실행합니다. (최대 RSS는 프로세스 단위로만 측정되므로 크기별로 분리)
+    Returns:
+        ISOLATED_MEASUREMENTS[name](*args)의 결과 dict
+    """
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--isolated", name, *map(str, args)],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def create_benchmark_engine():
+    """메모리 내 ChromaDB·타임라인과 가짜 임베딩을 사용하는 RAG 엔진을 생성합니다. (./chroma_db의 데이터는 건드리지 않음)"""
+    engine = RAGEngine("sk-benchmark")
+    engine.embeddings = FakeEmbeddings()
+    engine.chroma_client = chromadb.EphemeralClient()
+    engine.timeline = TimelineIndex(":memory:")
+    engine.collection_name = "benchmark_documents"
+    engine.reset_database()
+    return engine
+
+
+# ---------------------------------------------------------
+# 1. 스트리밍 적재 (add_documents) 메모리 측정
+# ---------------------------------------------------------
+def iter_synthetic_documents(num_chunks):
+    """
+    청크 1개 분량의 작업일보 문서를 num_chunks개 생성하는 제너레이터
+    (문서마다 다른 관리번호를 넣어 유사 중복 제거에 걸리지 않는 서로 다른 문서로 만듦)
+    """
+    for i in range(num_chunks):
+        text = (
+            f"작업일보 {i}호 - 날짜: 2024년 7월 {i % 28 + 1}일. "
+            f"관리번호: {hashlib.sha1(str(i).encode('utf-8')).hexdigest()[:32]}. "
+            f"금일 작업 내용: 토공사 터파기 및 사토 반출 {i % 97}m3. "
+            "특이 사항: 우천으로 인한 부분 작업 중지, 배수로 점검 및 양수기 가동."
+        )
+        yield "작업일보", f"daily_{i}.txt", text
+
+
+def measure_ingest(num_chunks):
+    engine = create_benchmark_engine()
+    stats, elapsed, peak_mb = measure(engine.add_documents, iter_synthetic_documents(num_chunks))
+    return {"chunks": stats["chunks"], "seconds": elapsed, "heap_mb": peak_mb, "rss_mb": peak_rss_mb()}
+
+
+def benchmark_ingest():
+    print("| 청크 수 | 시간(초) | Python 힙 최대(MB) | 최대 RSS(MB) |")
+    print("|---|---|---|---|")
+    for num_chunks in (1_000, 50_000):
+        result = run_isolated("ingest", num_chunks)
+        print(f"| {result['chunks']:,} | {result['seconds']:.1f} | {result['heap_mb']:.1f} | {result['rss_mb']:.1f} |")
+
+
+# ---------------------------------------------------------
+# 2. 엑셀 추출: openpyxl 스트리밍 vs UnstructuredExcelLoader
+# ---------------------------------------------------------
+def create_daily_log_workbook(file_path, num_rows):
+    """num_rows행짜리 작업일보 엑셀 파일을 쓰기 전용 모드로 생성합니다."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("작업일보")
+    sheet.append(["일자", "공종", "작업내용", "인원", "장비", "비고"])
+    for i in range(num_rows):
+        sheet.append([
+            date(2024, 1, 1) + timedelta(days=i % 365),
+            ["토공", "철근콘크리트", "포장", "배수"][i % 4],
+            f"터파기 및 사토 반출 {i % 97}m3",
+            10 + i % 20,
+            "굴착기 2대",
+            "우천 중지" if i % 13 == 0 else "",
+        ])
+    workbook.save(file_path)
+
+
+def benchmark_excel(num_rows=50_000):
+    from langchain_community.document_loaders import UnstructuredExcelLoader
+    from utils import iter_excel_row_groups
+
+    def load_with_openpyxl(file_path):
+        # 구간을 하나씩 소비만 하고 버림 (스트리밍)
+        return sum(1 for _ in iter_excel_row_groups(file_path))
+
+    def load_with_unstructured(file_path):
+        return "\n".join(d.page_content for d in UnstructuredExcelLoader(file_path).load())
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, "daily_log.xlsx")
+        create_daily_log_workbook(file_path, num_rows)
+
+        print(f"{num_rows:,}행 작업일보")
+        print("| 추출기 | 시간(초) | 최대 메모리(MB) |")
+        print("|---|---|---|")
+        for name, loader in (("openpyxl (read-only)", load_with_openpyxl),
+                             ("UnstructuredExcelLoader", load_with_unstructured)):
+            _, elapsed, peak_mb = measure(loader, file_path)
+            print(f"| {name} | {elapsed:.1f} | {peak_mb:.1f} |")
+
+
+# ---------------------------------------------------------
+# 3. HNSW 파라미터 튜닝 (recall@k vs 적재/검색 시간)
+# ---------------------------------------------------------
+def benchmark_hnsw(num_chunks=10_000):
+    from hnsw_tuner import tune_hnsw
+
+    engine = create_benchmark_engine()
+    engine.add_documents(iter_synthetic_documents(num_chunks))
+    best, results = tune_hnsw(engine, target_recall=0.95)
+    for trial in results:
+        print(
+            f"M={trial.params['hnsw:M']:>3} construction_ef={trial.params['hnsw:construction_ef']:>4} "
+            f"search_ef={trial.params['hnsw:search_ef']:>4} | recall={trial.recall:.3f} "
+            f"ingest={trial.ingest_seconds:.2f}s query={trial.query_ms:.2f}ms"
+        )
+    print(f"추천 파라미터 ({num_chunks:,} 청크): {best}")
+
+
+BENCHMARKS = {
+    "ingest": benchmark_ingest,
+    "excel": benchmark_excel,
+    "hnsw": benchmark_hnsw,
+}
+
+# 별도 프로세스에서 실행하는 측정 (run_isolated)
+ISOLATED_MEASUREMENTS = {
+    "ingest": measure_ingest,
+}
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--isolated"]:
+        print(json.dumps(ISOLATED_MEASUREMENTS[sys.argv[2]](*map(int, sys.argv[3:]))))
+        sys.exit(0)
+
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"\n### {name}")
+        BENCHMARKS[name]()
@@ -0,0 +1,150 @@
+"""
+유사 중복 제거: 한글 문자 n-gram(shingle) MinHash + LSH로 거의 같은 문서/청크를 찾습니다.
+(이메일 인용, 공문 개정본, 작업일보 공통 머리말 등)
+"""
+import hashlib
+import re
+from typing import Dict, Hashable, Iterable, List, Optional, Union
+
+import numpy as np
+
+DEFAULT_SHINGLE_SIZE = 5       # 문자 n-gram 길이 (공백 제거 후)
+DEFAULT_NUM_PERM = 128         # MinHash 해시 함수 수
+DEFAULT_BANDS = 8              # LSH 밴드 수 (밴드당 행 수 = NUM_PERM / BANDS, 8×16은 유사도 0.95에서 후보 확률 약 99%, 0.6 이하는 0.3% 미만)
+MAX_BUCKET_SIZE = 16           # LSH 버킷당 보관하는 최대 항목 수 (같은 양식의 청크가 한 버킷에 몰려 비교가 전수 검사가 되지 않도록)
+DEFAULT_DEDUP_THRESHOLD = 0.95 # 이 이상의 추정 Jaccard 유사도를 중복으로 판단 (같은 양식의 다른 기록은 남도록 엄격하게)
+SHINGLE_BLOCK_SIZE = 1024      # 서명 계산 시 한 번에 처리하는 shingle 수 (메모리 상한: NUM_PERM × 블록 × 8바이트)
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _shingle_hashes(text: str, shingle_size: int) -> np.ndarray:
+    """공백을 제거한 텍스트의 문자 n-gram 집합을 32비트 해시 배열로 변환합니다. (문자열 집합을 만들지 않고 해시값으로 중복 제거)"""
+    normalized = _WHITESPACE.sub("", text)
+    if not normalized:
+        return np.empty(0, dtype=np.uint64)
+    count = max(len(normalized) - shingle_size + 1, 1)
+    hashes = np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(normalized[i:i + shingle_size].encode("utf-8"), digest_size=4).digest(), "little")
+            for i in range(count)
+        ),
+        dtype=np.uint64,
+        count=count
+    )
+    return np.unique(hashes)
+
+
+class MinHasher:
+    """고정된 시드의 해시 함수 num_perm개로 MinHash 서명을 계산합니다."""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, shingle_size: int = DEFAULT_SHINGLE_SIZE, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def empty(self) -> np.ndarray:
+        return np.full(self.num_perm, _MERSENNE_PRIME, dtype=np.uint64)
+
+    def update(self, signature: np.ndarray, text: str) -> np.ndarray:
+        """기존 서명에 text의 shingle을 반영합니다. (문서를 구간 단위로 나누어 계산할 때 사용)"""
+        hashes = _shingle_hashes(text, self.shingle_size)
+        # 긴 구간도 메모리 사용량이 일정하도록 블록 단위로 계산하여 최솟값을 누적
+        for start in range(0, hashes.size, SHINGLE_BLOCK_SIZE):
+            block = hashes[start:start + SHINGLE_BLOCK_SIZE]
+            values = (self._a[:, None] * block[None, :] + self._b[:, None]) % _MERSENNE_PRIME
+            signature = np.minimum(signature, values.min(axis=1))
+        return signature
+
+    def signature(self, text: str) -> np.ndarray:
+        return self.update(self.empty(), text)
+
+
+class NearDuplicateIndex:
+    """
+    MinHash 서명을 LSH 밴드 버킷에 넣어 유사 중복 후보를 빠르게 찾는 인덱스
+    후보는 서명 일치율(추정 Jaccard 유사도)로 다시 확인합니다.
+    원본(중복이 아닌) 항목만 저장하며, 서명은 uint32 행렬에, 버킷은 밴드 해시 → 행 번호로 보관합니다.
+    (항목당 약 1.5KB: 서명 NUM_PERM × 4바이트 + 밴드별 버킷 항목 + 키, 질의당 비교 수는 BANDS × MAX_BUCKET_SIZE 이하)
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_DEDUP_THRESHOLD,
+        num_perm: int = DEFAULT_NUM_PERM,
+        bands: int = DEFAULT_BANDS,
+        hasher: Optional[MinHasher] = None
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm은 bands의 배수여야 합니다.")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = hasher or MinHasher(num_perm=num_perm)
+        # 밴드 해시 → 행 번호 (항목이 하나인 버킷은 리스트 없이 행 번호만 보관)
+        self._buckets: List[Dict[int, Union[int, List[int]]]] = [{} for _ in range(bands)]
+        self._keys: List[Hashable] = []
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _band_keys(self, signature: np.ndarray) -> Iterable[int]:
+        for band in range(self.bands):
+            yield hash(signature[band * self.rows:(band + 1) * self.rows].tobytes())
+
+    def query(self, signature: np.ndarray) -> Optional[Hashable]:
+        """임계값 이상으로 가장 유사한 기존 항목의 키 (없으면 None)"""
+        signature = signature.astype(np.uint32)
+        candidates = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(band_key)
+            if isinstance(bucket, int):
+                candidates.add(bucket)
+            elif bucket:
+                candidates.update(bucket)
+        if not candidates:
+            return None
+
+        rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarities = np.mean(self._signatures[rows] == signature, axis=1)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        return self._keys[rows[best]]
+
+    def add(self, key: Hashable, signature: np.ndarray):
+        row = len(self._keys)
+        if row == self._signatures.shape[0]:
+            # 용량을 두 배로 늘려 추가 비용을 상수로 유지
+            grown = np.empty((max(2 * row, 64), self._signatures.shape[1]), dtype=np.uint32)
+            grown[:row] = self._signatures[:row]
+            self._signatures = grown
+        self._signatures[row] = signature
+        self._keys.append(key)
+        for band, band_key in enumerate(self._band_keys(self._signatures[row])):
+            buckets = self._buckets[band]
+            bucket = buckets.get(band_key)
+            if bucket is None:
+                buckets[band_key] = row
+            elif isinstance(bucket, int):
+                buckets[band_key] = [bucket, row]
+            elif len(bucket) < MAX_BUCKET_SIZE:
+                # 가득 찬 버킷은 기존 항목이 대표하므로 더 넣지 않음 (다른 밴드에서 후보가 될 수 있음)
+                bucket.append(row)
+
+    def find_or_add(self, key: Hashable, text: str) -> Optional[Hashable]:
+        """
+        text가 기존 항목과 유사 중복이면 그 항목(원본)의 키를 반환하고,
+        아니면 key로 인덱스에 추가한 뒤 None을 반환합니다.
+        """
+        return self.find_or_add_signature(key, self.hasher.signature(text))
+
+    def find_or_add_signature(self, key: Hashable, signature: np.ndarray) -> Optional[Hashable]:
+        canonical = self.query(signature)
+        if canonical is None:
+            self.add(key, signature)
+        return canonical
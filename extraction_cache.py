@@ -0,0 +1,180 @@
+"""
+업로드 파일 추출 결과 캐시: 파일 내용(SHA-256) 기반 디스크 저장소
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+# 기본 저장 위치 및 디스크 사용량 상한
+DEFAULT_CACHE_DIR = os.path.join(os.getcwd(), "extraction_cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# 추출 로직이 바뀌면 올려서 기존 캐시를 무효화합니다.
+EXTRACTOR_VERSION = "1"
+
+Segment = Tuple[Dict[str, Any], str]
+
+
+class ExtractionCache:
+    """
+    추출된 텍스트 구간을 gzip 압축 JSON Lines 파일로 저장하는 캐시
+    키는 (추출기 버전 + 파일 바이트)의 SHA-256이므로 같은 파일은 파일명과 무관하게 한 번만 파싱됩니다.
+    디스크 사용량이 max_bytes를 넘으면 가장 오래 사용되지 않은 항목부터 삭제합니다. (LRU)
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pins: Dict[str, int] = {}  # 세션 문서 핸들이 참조 중인 키 → 참조 수
+
+    @staticmethod
+    def key_for(data: bytes) -> str:
+        """파일 바이트에 대한 캐시 키 계산"""
+        digest = hashlib.sha256(EXTRACTOR_VERSION.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.jsonl.gz")
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def size_of(self, key: str) -> int:
+        """저장된 항목의 압축 크기(바이트), 없으면 0"""
+        try:
+            return os.path.getsize(self._path(key))
+        except OSError:
+            return 0
+
+    def iter_segments(self, key: str) -> Iterator[Segment]:
+        """
+        저장된 구간을 하나씩 읽어오는 제너레이터 (압축 해제도 스트리밍으로 처리)
+        읽을 때마다 수정 시각을 갱신하여 LRU 순서에 반영합니다.
+        """
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            raise KeyError(key)
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                yield record["meta"], record["text"]
+
+    def put(self, key: str, segments: Iterable[Segment]) -> int:
+        """
+        구간을 스트리밍으로 압축 저장합니다. 임시 파일에 쓴 뒤 교체하므로 동시 저장에도 안전합니다.
+        Returns:
+            저장된 구간 수
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix=".jsonl.gz")
+        count = 0
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+                for meta, text in segments:
+                    f.write(json.dumps({"meta": meta, "text": text}, ensure_ascii=False) + "\n")
+                    count += 1
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # 방금 저장한 항목은 이번 정리에서 제외 (상한보다 큰 항목도 최소 한 번은 읽을 수 있도록)
+        self.evict(protect=(key,))
+        return count
+
+    def pin(self, key: str):
+        """
+        참조 중인 항목으로 표시하여 용량 정리에서 제외합니다. (unpin 호출 시까지)
+        고정된 항목이 많으면 디스크 사용량이 일시적으로 max_bytes를 넘을 수 있습니다.
+        """
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, key: str):
+        with self._lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+
+    def scratch_file(self, data: bytes, suffix: str) -> str:
+        """파서가 읽을 수 있도록 파일 바이트를 임시 파일로 저장하고 경로를 반환합니다. (호출자가 삭제)"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix=suffix)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return tmp_path
+
+    def total_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        """(경로, 크기, 마지막 사용 시각) 목록"""
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            if dirpath == self.tmp_dir:
+                continue
+            for name in filenames:
+                if not name.endswith(".jsonl.gz"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self, protect: Iterable[str] = ()) -> int:
+        """
+        디스크 사용량이 상한 이하가 될 때까지 오래된 항목부터 삭제합니다.
+        Args:
+            protect: 삭제하지 않을 캐시 키 (pin()으로 고정된 키는 항상 제외)
+        Returns:
+            삭제된 항목 수
+        """
+        with self._lock:
+            protected = {self._path(key) for key in (*protect, *self._pins)}
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+                if total <= self.max_bytes:
+                    break
+                if path in protected:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            return removed
+
+
+_default_cache: Optional[ExtractionCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """프로세스 전역 추출 캐시를 반환합니다."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ExtractionCache()
+        return _default_cache
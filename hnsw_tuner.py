@@ -0,0 +1,214 @@
+"""
+HNSW 인덱스 파라미터 튜너: 정확 검색 대비 recall@k와 적재/검색 시간을 측정하여 파라미터 추천
+"""
+import time
+import uuid
+from dataclasses import dataclass
+from itertools import product
+from typing import Dict, List, Optional, Tuple
+
+import chromadb
+import numpy as np
+
+from rag_engine import _iter_batches
+
+# 기본 탐색 후보 (M, construction_ef, search_ef)
+DEFAULT_M_VALUES = (8, 16, 32)
+DEFAULT_CONSTRUCTION_EF_VALUES = (64, 100, 200)
+DEFAULT_SEARCH_EF_VALUES = (10, 32, 64, 128)
+
+# 튜닝 시 사용하는 최대 벡터 수 (큰 프로젝트는 표본으로 측정)
+MAX_TUNING_VECTORS = 20_000
+
+# 컬렉션 복사·임베딩 읽기 시 한 번에 읽는 레코드 수
+COPY_PAGE_SIZE = 1_000
+
+
+@dataclass
+class HNSWTrialResult:
+    """파라미터 조합 하나에 대한 측정 결과"""
+    params: Dict[str, int]
+    recall: float
+    ingest_seconds: float
+    query_ms: float
+    cost: float
+
+
+def default_grid() -> List[Dict[str, int]]:
+    """기본 탐색 후보 파라미터 조합"""
+    return [
+        {"hnsw:M": m, "hnsw:construction_ef": construction_ef, "hnsw:search_ef": search_ef}
+        for m, construction_ef, search_ef in product(
+            DEFAULT_M_VALUES, DEFAULT_CONSTRUCTION_EF_VALUES, DEFAULT_SEARCH_EF_VALUES
+        )
+        if search_ef <= construction_ef
+    ]
+
+
+def _load_embeddings(collection, max_vectors: int, rng: np.random.Generator) -> Tuple[List[str], np.ndarray]:
+    """
+    컬렉션에서 (ID, 임베딩 행렬)을 읽고, max_vectors를 넘으면 무작위 표본을 사용합니다.
+    ID만 먼저 읽어 표본을 고른 뒤, 표본의 임베딩만 페이지 단위로 가져옵니다.
+    """
+    ids = list(collection.get(include=[])["ids"])
+    if len(ids) > max_vectors:
+        sample = rng.choice(len(ids), size=max_vectors, replace=False)
+        ids = [ids[i] for i in sample]
+
+    vectors = None
+    for start, page in zip(range(0, len(ids), COPY_PAGE_SIZE), _iter_batches(ids, COPY_PAGE_SIZE)):
+        data = collection.get(ids=page, include=["embeddings"])
+        by_id = dict(zip(data["ids"], data["embeddings"]))
+        page_vectors = np.asarray([by_id[record_id] for record_id in page], dtype=np.float32)
+        if vectors is None:
+            vectors = np.empty((len(ids), page_vectors.shape[1]), dtype=np.float32)
+        vectors[start:start + len(page)] = page_vectors
+    if vectors is None:
+        vectors = np.empty((0, 0), dtype=np.float32)
+    return ids, vectors
+
+
+def _exact_top_k(vectors: np.ndarray, positions: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    """코사인 유사도 전수 검색으로 positions(인덱스에 적재되는 행) 중 정답 top-k 위치 집합을 계산합니다."""
+    indexed = vectors[positions]
+    normalized = indexed / np.maximum(np.linalg.norm(indexed, axis=1, keepdims=True), 1e-12)
+    normalized_queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    similarities = normalized_queries @ normalized.T
+    top = np.argpartition(-similarities, kth=min(k, indexed.shape[0] - 1), axis=1)[:, :k]
+    return [set(positions[row].tolist()) for row in top]
+
+
+def _run_trial(
+    client,
+    params: Dict[str, int],
+    positions: np.ndarray,
+    vectors: np.ndarray,
+    query_indices: np.ndarray,
+    exact: List[set],
+    k: int,
+    batch_size: int,
+    expected_queries: int,
+    scale: float
+) -> HNSWTrialResult:
+    """
+    임시 컬렉션에 positions 행만 적재하여 적재 시간, 검색 지연, recall@k를 측정합니다.
+    질의 벡터는 인덱스에 넣지 않아 자기 자신이 검색되어 recall이 부풀려지지 않도록 합니다.
+    적재 시간은 scale(전체 코퍼스 / 표본 크기)을 곱해 전체 코퍼스 기준으로 환산합니다.
+    """
+    name = f"hnsw_tuning_{uuid.uuid4().hex[:8]}"
+    collection = client.create_collection(name=name, metadata={"hnsw:space": "cosine", **params})
+    try:
+        start = time.perf_counter()
+        for batch in _iter_batches(positions.tolist(), batch_size):
+            collection.add(ids=[str(i) for i in batch], embeddings=vectors[batch].tolist())
+        ingest_seconds = (time.perf_counter() - start) * scale
+
+        hits = 0
+        query_seconds = 0.0
+        for query_index, expected in zip(query_indices, exact):
+            start = time.perf_counter()
+            result = collection.query(query_embeddings=[vectors[query_index].tolist()], n_results=k)
+            query_seconds += time.perf_counter() - start
+            found = {int(i) for i in result["ids"][0]}
+            hits += len(found & expected)
+
+        recall = hits / (len(query_indices) * k)
+        mean_query_seconds = query_seconds / len(query_indices)
+        # 비용 = 전체 적재 시간 + 예상 질의 수만큼의 검색 시간
+        cost = ingest_seconds + mean_query_seconds * expected_queries
+        return HNSWTrialResult(params, recall, ingest_seconds, mean_query_seconds * 1000, cost)
+    finally:
+        client.delete_collection(name=name)
+
+
+def tune_hnsw(
+    engine,
+    target_recall: float = 0.95,
+    k: int = 5,
+    num_queries: int = 50,
+    grid: Optional[List[Dict[str, int]]] = None,
+    expected_queries: int = 1_000,
+    apply: bool = False,
+    seed: int = 0
+) -> Tuple[Dict[str, int], List[HNSWTrialResult]]:
+    """
+    적재된 청크에서 질의를 표본 추출하여 HNSW 파라미터 조합별 recall@k와 적재/검색 시간을 측정하고,
+    목표 recall을 만족하는 조합 중 비용(적재 시간 + 예상 질의 수 × 검색 시간)이 가장 낮은 조합을 추천합니다.
+    Args:
+        engine: 문서가 적재된 RAGEngine
+        target_recall: 목표 recall@k (0~1)
+        k: 검색 결과 수
+        num_queries: 표본 질의 수
+        grid: 탐색할 파라미터 조합 목록 (기본값: default_grid())
+        expected_queries: 인덱스 수명 동안 예상되는 질의 수 (비용 계산용)
+        apply: True이면 추천 파라미터로 엔진의 컬렉션을 재구성합니다.
+    Returns:
+        (추천 파라미터, 조합별 측정 결과 리스트)
+    """
+    if engine.collection is None or engine.collection.count() == 0:
+        raise ValueError("튜닝할 문서가 없습니다. 먼저 add_documents로 문서를 적재하세요.")
+
+    rng = np.random.default_rng(seed)
+    ids, vectors = _load_embeddings(engine.collection, MAX_TUNING_VECTORS, rng)
+    if len(ids) < 2:
+        raise ValueError("튜닝하려면 청크가 2개 이상 필요합니다.")
+    # 질의로 쓸 벡터는 인덱스에서 제외 (적재 벡터 중 최소 1개는 남김)
+    query_indices = rng.choice(len(ids), size=min(num_queries, len(ids) - 1), replace=False)
+    positions = np.setdiff1d(np.arange(len(ids)), query_indices)
+    k = min(k, len(positions))
+    exact = _exact_top_k(vectors, positions, vectors[query_indices], k)
+
+    # 표본 크기를 실제 코퍼스 크기로 환산하여 적재 비용 비교
+    scale = engine.collection.count() / len(positions)
+    batch_size = min(engine.ingest_batch_size * 4, engine._max_batch_size() or COPY_PAGE_SIZE)
+
+    client = chromadb.EphemeralClient()
+    results = []
+    for params in grid or default_grid():
+        results.append(_run_trial(
+            client, params, positions, vectors, query_indices, exact, k, batch_size, expected_queries, scale
+        ))
+
+    passing = [trial for trial in results if trial.recall >= target_recall]
+    if passing:
+        best = min(passing, key=lambda trial: trial.cost)
+    else:
+        # 목표를 만족하는 조합이 없으면 recall이 가장 높은 조합
+        best = max(results, key=lambda trial: (trial.recall, -trial.cost))
+
+    if apply:
+        apply_hnsw_params(engine, best.params)
+
+    return best.params, results
+
+
+def apply_hnsw_params(engine, hnsw_params: Dict[str, int]):
+    """
+    새 HNSW 파라미터로 엔진의 컬렉션을 재구성합니다. (기존 레코드를 복사한 뒤 교체)
+    HNSW 파라미터는 컬렉션 생성 후 변경할 수 없으므로 새 컬렉션을 만들어 옮깁니다.
+    """
+    engine.hnsw_params = {**engine.hnsw_params, **hnsw_params}
+    old_collection = engine.collection
+    rebuilt_name = f"{engine.collection_name}_rebuild_{uuid.uuid4().hex[:8]}"
+    rebuilt = engine.chroma_client.create_collection(name=rebuilt_name, metadata=engine._collection_metadata())
+
+    offset = 0
+    while True:
+        page = old_collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=COPY_PAGE_SIZE,
+            offset=offset
+        )
+        if not page["ids"]:
+            break
+        rebuilt.add(
+            ids=page["ids"],
+            embeddings=page["embeddings"],
+            documents=page["documents"],
+            metadatas=page["metadatas"]
+        )
+        offset += len(page["ids"])
+
+    engine.chroma_client.delete_collection(name=engine.collection_name)
+    rebuilt.modify(name=engine.collection_name)
+    engine.collection = rebuilt
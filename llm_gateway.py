@@ -0,0 +1,323 @@
+"""
+LLM 게이트웨이: 프로세스 전역 LLM/임베딩 호출 동시성 제어
+- 토큰 버킷 기반 요청 속도 제한 (429 방지)
+- 우선순위 대기열 (대화 답변 > 추천 질문 > 일괄/리스크 분석)
+- 동일 요청 단일 실행 (single-flight): 같은 요청이 동시에 들어오면 한 번만 호출하고 결과를 공유
+"""
+import asyncio
+import contextvars
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# 기본 설정 (환경변수로 조정 가능)
+DEFAULT_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "5"))
+DEFAULT_BURST = int(os.getenv("LLM_BURST", "10"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# 대기 시간 통계에 보관하는 최근 표본 수
+WAIT_SAMPLE_SIZE = 1000
+
+# 비동기 호출이 순번/슬롯을 다시 확인하는 간격(초)
+ASYNC_POLL_INTERVAL = 0.05
+
+
+# track_execution() 블록별 실행 시간 누적기 (스레드/비동기 작업마다 독립)
+_execution_trackers = contextvars.ContextVar("llm_gateway_execution_trackers", default=())
+
+
+@contextmanager
+def track_execution() -> Iterator[Dict[str, float]]:
+    """
+    블록 안에서 현재 스레드(또는 비동기 작업)가 게이트웨이로 직접 실행한 호출의 실행 시간 합계를 기록합니다.
+    대기열·속도 제한 대기 시간과, 다른 요청에 병합되어 실행하지 않은 호출은 포함하지 않습니다.
+    Yields:
+        {"seconds": 실행 시간 합계, "calls": 실행한 호출 수}
+    """
+    timing = {"seconds": 0.0, "calls": 0}
+    token = _execution_trackers.set(_execution_trackers.get() + (timing,))
+    try:
+        yield timing
+    finally:
+        _execution_trackers.reset(token)
+
+
+def _record_execution(seconds: float):
+    for timing in _execution_trackers.get():
+        timing["seconds"] += seconds
+        timing["calls"] += 1
+
+
+class Priority(IntEnum):
+    """요청 우선순위 (값이 작을수록 먼저 처리)"""
+    INTERACTIVE = 0  # 사용자 질문에 대한 답변
+    FOLLOW_UP = 1    # 추천 질문 생성
+    BATCH = 2        # 리스크 분석, 문서 임베딩, 보고서 생성 등
+
+
+class TokenBucket:
+    """초당 rate개씩 채워지고 최대 capacity개까지 쌓이는 토큰 버킷 (호출자가 잠금 관리)"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> float:
+        """
+        토큰 1개를 가져옵니다.
+        Returns:
+            0이면 성공, 양수이면 다음 토큰까지 기다려야 하는 시간(초)
+        """
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def request_key(*parts: Any) -> str:
+    """요청 내용(모델명, 프롬프트 등)으로 single-flight 키를 생성합니다."""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMGateway:
+    """프로세스 전역 LLM 호출 게이트웨이"""
+
+    def __init__(
+        self,
+        requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+        burst: int = DEFAULT_BURST,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    ):
+        self.max_concurrency = max_concurrency
+        self._bucket = TokenBucket(requests_per_second, burst)
+        self._condition = threading.Condition()
+        self._waiting = []  # (우선순위, 순번) 힙
+        self._sequence = itertools.count()
+        self._active = 0
+
+        self._in_flight: Dict[str, Future] = {}
+        self._in_flight_lock = threading.Lock()
+
+        # 지표
+        self._wait_samples = {priority: deque(maxlen=WAIT_SAMPLE_SIZE) for priority in Priority}
+        self._request_count = 0
+        self._coalesced_count = 0
+
+    def call(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        priority: Priority = Priority.INTERACTIVE,
+        key: Optional[str] = None,
+        **kwargs
+    ) -> Any:
+        """
+        속도 제한과 우선순위를 적용하여 fn(*args, **kwargs)를 실행합니다.
+        key가 같은 요청이 이미 실행 중이면 새로 호출하지 않고 그 결과를 기다려 반환합니다.
+        """
+        if key is None:
+            return self._execute(fn, args, kwargs, priority)
+        return self.coalesce(self._execute, fn, args, kwargs, priority, key=key)
+
+    def coalesce(self, fn: Callable[..., Any], *args, key: str, **kwargs) -> Any:
+        """
+        동일 요청 병합만 적용하여 fn(*args, **kwargs)를 실행합니다. (슬롯과 토큰은 확보하지 않음)
+        재시도처럼 fn 안에서 시도마다 call()로 슬롯과 토큰을 다시 확보하는 요청에 사용합니다.
+        """
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self._coalesced_count += 1
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.pop(key, None)
+
+    async def acall(
+        self,
+        coroutine_fn: Callable[..., Any],
+        *args,
+        priority: Priority = Priority.INTERACTIVE,
+        key: Optional[str] = None,
+        **kwargs
+    ) -> Any:
+        """
+        call()의 비동기 버전: 스레드를 점유하지 않고 대기한 뒤 await coroutine_fn(*args, **kwargs)를 실행합니다.
+        속도 제한, 우선순위 대기열, 동일 요청 병합은 동기 호출과 공유합니다.
+        """
+        if key is None:
+            return await self._aexecute(coroutine_fn, args, kwargs, priority)
+        return await self.acoalesce(self._aexecute, coroutine_fn, args, kwargs, priority, key=key)
+
+    async def acoalesce(self, coroutine_fn: Callable[..., Any], *args, key: str, **kwargs) -> Any:
+        """coalesce()의 비동기 버전 (동기 호출과 같은 키로 병합)"""
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self._coalesced_count += 1
+
+        if not is_leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await coroutine_fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.pop(key, None)
+
+    async def _aexecute(self, coroutine_fn, args, kwargs, priority: Priority) -> Any:
+        await self._aacquire(priority)
+        started = time.perf_counter()
+        try:
+            return await coroutine_fn(*args, **kwargs)
+        finally:
+            _record_execution(time.perf_counter() - started)
+            self._release()
+
+    async def _aacquire(self, priority: Priority):
+        """_acquire()의 비동기 버전: 조건 변수 대신 짧은 간격으로 다시 확인합니다."""
+        ticket = (int(priority), next(self._sequence))
+        enqueued_at = time.monotonic()
+
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+        try:
+            while True:
+                with self._condition:
+                    wait = ASYNC_POLL_INTERVAL
+                    if self._waiting[0] == ticket and self._active < self.max_concurrency:
+                        wait = self._bucket.try_take()
+                        if wait == 0:
+                            heapq.heappop(self._waiting)
+                            self._active += 1
+                            self._request_count += 1
+                            self._condition.notify_all()
+                            break
+                await asyncio.sleep(min(wait, ASYNC_POLL_INTERVAL))
+        except BaseException:
+            # 대기 중 취소되면 대기열에서 제거
+            with self._condition:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._condition.notify_all()
+            raise
+
+        self._wait_samples[priority].append(time.monotonic() - enqueued_at)
+
+    def _execute(self, fn, args, kwargs, priority: Priority) -> Any:
+        self._acquire(priority)
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _record_execution(time.perf_counter() - started)
+            self._release()
+
+    def _acquire(self, priority: Priority):
+        """대기열 맨 앞이 되고, 동시 실행 슬롯과 토큰이 모두 확보될 때까지 대기합니다."""
+        ticket = (int(priority), next(self._sequence))
+        enqueued_at = time.monotonic()
+
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                if self._waiting[0] == ticket and self._active < self.max_concurrency:
+                    wait = self._bucket.try_take()
+                    if wait == 0:
+                        heapq.heappop(self._waiting)
+                        self._active += 1
+                        self._request_count += 1
+                        # 다음 순번이 바로 확인할 수 있도록 깨움
+                        self._condition.notify_all()
+                        break
+                    self._condition.wait(timeout=wait)
+                else:
+                    self._condition.wait()
+
+        self._wait_samples[priority].append(time.monotonic() - enqueued_at)
+
+    def _release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def metrics(self) -> Dict[str, Any]:
+        """대기열 길이, 실행 중인 요청 수, 우선순위별 대기 시간 통계"""
+        with self._condition:
+            queue_depth = {priority.name: 0 for priority in Priority}
+            for priority, _ in self._waiting:
+                queue_depth[Priority(priority).name] += 1
+            active = self._active
+
+        wait_seconds = {}
+        for priority, samples in self._wait_samples.items():
+            ordered = sorted(samples)
+            wait_seconds[priority.name] = {
+                "count": len(ordered),
+                "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+                "p95": ordered[int(len(ordered) * 0.95)] if ordered else 0.0,
+                "max": ordered[-1] if ordered else 0.0,
+            }
+
+        return {
+            "queue_depth": queue_depth,
+            "active": active,
+            "requests": self._request_count,
+            "coalesced": self._coalesced_count,
+            "wait_seconds": wait_seconds,
+        }
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """프로세스 전역 LLM 게이트웨이를 반환합니다. (모든 세션이 공유)"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
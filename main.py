@@ -16,8 +16,12 @@ from typing import List, Tuple
 import re
 
 # 로컬 모듈 임포트
-from utils import extract_text_from_file, format_documents_for_prompt
+from utils import extract_document, format_documents_for_prompt
 from rag_engine import RAGEngine
+from llm_gateway import get_gateway
+from model_router import get_usage_stats
+from session_store import estimate_session_bytes, get_session_registry, release_documents
+from report_builder import build_risk_report
 from prompts import (
     DEFAULT_SYSTEM_PROMPT,
     DEFAULT_PERSONA_1_PROMPT,
@@ -120,8 +124,10 @@ def initialize_session_state():
         st.session_state.persona_2_prompt = DEFAULT_PERSONA_2_PROMPT
         st.session_state.persona_3_prompt = DEFAULT_PERSONA_3_PROMPT
         
-        # 업로드된 파일들
+        # 업로드된 파일들 (DocumentHandle 리스트, 본문은 추출 캐시에 보관)
         st.session_state.uploaded_documents = []
+        # 파일 업로더 위젯 키 세대 (세션 해제 시 바꿔서 업로더가 원본 파일을 다시 붙잡지 않도록 함)
+        st.session_state.uploader_generation = 0
         
         # Risk 분석 결과
         st.session_state.risks = []
@@ -140,6 +146,75 @@ def initialize_session_state():
         st.session_state.initialized = True
 
 
+# 유휴 세션 해제 시 초기화할 상태 (문서, 분석 결과, 대화, RAG 엔진)
+RELEASABLE_SESSION_STATE = {
+    'uploaded_documents': list,
+    'risks': list,
+    'risks_analyzed': lambda: False,
+    'selected_risk': lambda: None,
+    'selected_risk_index': lambda: None,
+    'chat_history': list,
+    'follow_up_questions': list,
+    'risk_report': lambda: None,
+    'ingest_stats': dict,
+    'rag_engine': lambda: None,
+}
+
+
+# 문서 업로드 카테고리 (표시 이름 → 업로더 키 접미사)
+UPLOAD_CATEGORIES = {
+    "계약서": "contract",
+    "공문서": "official",
+    "회의록": "meeting",
+    "이메일": "email",
+    "작업일보": "daily",
+    "기타": "etc"
+}
+
+
+def uploader_key(category_key: str, generation: int) -> str:
+    """파일 업로더 위젯 키"""
+    return f"upload_{category_key}_{generation}"
+
+
+def track_session():
+    """
+    현재 세션의 활동을 기록하고, 오래 사용하지 않은 다른 세션의 상태를 해제합니다.
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+
+    # 프록시(st.session_state)는 현재 세션만 가리키므로 실제 세션 상태 객체를 붙잡아 둠
+    session_state = ctx.session_state
+
+    session_id = ctx.session_id
+
+    def release():
+        release_documents(session_state.get('uploaded_documents', []))
+        for key, default in RELEASABLE_SESSION_STATE.items():
+            session_state[key] = default()
+
+        # 파일 업로더 값(원본 바이트를 가진 UploadedFile)을 지우고 키를 바꿔 빈 업로더로 다시 그림
+        generation = session_state.get('uploader_generation', 0)
+        for category_key in UPLOAD_CATEGORIES.values():
+            key = uploader_key(category_key, generation)
+            if key in session_state:
+                del session_state[key]
+        session_state['uploader_generation'] = generation + 1
+        if Runtime.exists():
+            Runtime.instance().uploaded_file_mgr.remove_session_files(session_id)
+
+        session_state['session_released'] = True
+
+    registry = get_session_registry()
+    registry.touch(ctx.session_id, release)
+    registry.evict_idle()
+
+
 # Settings 다이얼로그
 @st.dialog("⚙️ 설정 (Settings)", width="large")
 def settings_dialog():
@@ -248,23 +323,14 @@ def render_sidebar():
         
         st.subheader("📂 계약 자료 Upload")
         
-        categories = {
-            "계약서": "contract",
-            "공문서": "official",
-            "회의록": "meeting",
-            "이메일": "email",
-            "작업일보": "daily",
-            "기타": "etc"
-        }
-        
         uploaded_files = {}
         
-        for category_name, category_key in categories.items():
+        for category_name, category_key in UPLOAD_CATEGORIES.items():
             files = st.file_uploader(
                 f"📁 {category_name}",
                 type=['pdf', 'docx', 'doc', 'xlsx', 'xls', 'txt'],
                 accept_multiple_files=True,
-                key=f"upload_{category_key}"
+                key=uploader_key(category_key, st.session_state.get('uploader_generation', 0))
             )
             if files:
                 uploaded_files[category_name] = files
@@ -289,8 +355,39 @@ def render_sidebar():
         # 업로드된 파일 정보 표시
         if st.session_state.uploaded_documents:
             st.write("### 📋 업로드된 파일")
-            for category, filename, _ in st.session_state.uploaded_documents:
-                st.write(f"- **{category}**: {filename}")
+            for document in st.session_state.uploaded_documents:
+                st.write(f"- **{document.category}**: {document.filename}")
+        
+        # 유사 중복 제거 결과
+        ingest_stats = st.session_state.get('ingest_stats')
+        if ingest_stats and (ingest_stats.get('duplicate_documents') or ingest_stats.get('duplicate_chunks')):
+            st.caption(
+                f"♻️ 중복 제외: 문서 {ingest_stats['duplicate_documents']}건, 청크 {ingest_stats['duplicate_chunks']}건 "
+                f"(임베딩 {ingest_stats['tokens_saved']:,} 토큰 절감)"
+            )
+        
+        # 세션 메모리 사용량 (본문 텍스트는 디스크 캐시에 있으므로 포함되지 않음)
+        session_kb = estimate_session_bytes(st.session_state) / 1024
+        st.caption(f"💾 세션 메모리: {session_kb:,.1f} KB · 활성 세션: {get_session_registry().active_sessions()}")
+        
+        # LLM 게이트웨이 현황 (전체 세션 공유)
+        with st.expander("📈 LLM 호출 현황", expanded=False):
+            metrics = get_gateway().metrics()
+            st.write(f"- 실행 중: {metrics['active']}건 / 누적: {metrics['requests']}건 (중복 병합 {metrics['coalesced']}건)")
+            for priority, depth in metrics['queue_depth'].items():
+                wait = metrics['wait_seconds'][priority]
+                st.write(f"- **{priority}**: 대기 {depth}건, 평균 대기 {wait['mean']:.2f}초 (p95 {wait['p95']:.2f}초)")
+            
+            # 작업별 모델 사용 현황 (라우팅 표 조정용)
+            for task, usage in get_usage_stats().metrics().items():
+                for model, model_usage in usage['models'].items():
+                    latency = model_usage['latency_seconds']
+                    st.write(
+                        f"- `{task}` → {model}: {model_usage['calls']}건, 평균 {latency['mean']:.1f}초 "
+                        f"(p95 {latency['p95']:.1f}초), 토큰 입력 {model_usage['input_tokens']:,} / 출력 {model_usage['output_tokens']:,}"
+                    )
+                if usage['fallbacks']:
+                    st.write(f"- `{task}` 대체 모델 사용 (지연 예산 초과·반복 오류): {usage['fallbacks']}건")
 
 
 def analyze_documents(uploaded_files: dict):
@@ -304,17 +401,26 @@ def analyze_documents(uploaded_files: dict):
             # 데이터베이스 초기화
             st.session_state.rag_engine.reset_database()
             
-            # 문서 처리
+            # 문서 처리 (본문은 추출 캐시에 저장하고 세션에는 핸들만 보관)
             documents = []
-            for category, files in uploaded_files.items():
-                for file in files:
-                    text = extract_text_from_file(file, file.name)
-                    documents.append((category, file.name, text))
+            try:
+                for category, files in uploaded_files.items():
+                    for file in files:
+                        documents.append(extract_document(file, file.name, category))
+            except Exception:
+                release_documents(documents)
+                raise
             
+            # 이전 분석의 문서 핸들은 캐시 고정 해제 (새 핸들을 먼저 만들어 같은 파일은 계속 고정됨)
+            release_documents(st.session_state.uploaded_documents)
             st.session_state.uploaded_documents = documents
+            st.session_state.session_released = False
             
-            # ChromaDB에 문서 추가
-            st.session_state.rag_engine.add_documents(documents)
+            # ChromaDB에 문서 추가 (본문은 캐시에서 구간 단위로 스트리밍, 유사 중복 제외)
+            st.session_state.ingest_stats = st.session_state.rag_engine.add_documents(
+                (document.category, document.filename, document)
+                for document in documents
+            )
             
             # Risk 분석 생성
             documents_text = format_documents_for_prompt(documents)
@@ -336,6 +442,7 @@ def analyze_documents(uploaded_files: dict):
                      st.warning(f"AI 응답 원문: {risk_analysis[:200]}...")
             
             st.session_state.risks_analyzed = True
+            st.session_state.risk_report = None
             st.session_state.selected_risk = None
             st.session_state.chat_history = []
             
@@ -359,6 +466,9 @@ def render_main_area():
         st.title("🏗️ 건설공사 클레임 어드바이저")
         st.write("### VO/Claim Advisor에 오신 것을 환영합니다!")
         
+        if st.session_state.get('session_released'):
+            st.info("⏱️ 장시간 사용하지 않아 이전 분석 결과가 해제되었습니다. 문서를 다시 분석해주세요.")
+        
         st.markdown("""
         #### 📌 주요 기능
         
@@ -410,6 +520,40 @@ def render_main_area():
             with st.expander("📝 상세 설명", expanded=False):
                 st.write(risk['description'])
         
+        # 전체 리포트 (Top 5 리스크 × 3개 페르소나)
+        if st.button("📄 전체 리포트 생성 (DOCX)", use_container_width=True):
+            generate_full_report()
+        
+        if st.session_state.get('risk_report'):
+            report = st.session_state.risk_report
+            st.download_button(
+                "⬇️ 리포트 다운로드",
+                data=report['data'],
+                file_name="claim_risk_report.docx",
+                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                use_container_width=True
+            )
+            st.caption(
+                f"생성 시간 {report['stats']['wall_seconds']:.1f}초 "
+                f"(순차 생성 추정 {report['stats']['sequential_seconds']:.1f}초: 검색 + LLM 실행 시간 합계, 대기 제외)"
+            )
+        
+        # 공기 관련 타임라인 (LLM 호출 없이 타임라인 인덱스에서 바로 계산)
+        timeline = st.session_state.rag_engine.timeline
+        stoppage = timeline.total_days()
+        overlaps = timeline.overlapping_events()
+        if stoppage['days'] or overlaps:
+            with st.expander("🗓️ 공기 관련 타임라인", expanded=False):
+                st.write(f"**공사 중지 일수 합계 (중복 제외)**: {stoppage['days']}일")
+                for start, end in stoppage['periods']:
+                    st.write(f"- {start} ~ {end}")
+                for overlap in overlaps:
+                    st.write(
+                        f"- 기간 중첩: {overlap['first']['filename']} [{overlap['first']['kind']}] ↔ "
+                        f"{overlap['second']['filename']} [{overlap['second']['kind']}] "
+                        f"{overlap['overlap_start']} ~ {overlap['overlap_end']} ({overlap['overlap_days']}일)"
+                    )
+        
         st.divider()
         
         # 채팅 인터페이스
@@ -417,6 +561,31 @@ def render_main_area():
             render_chat_interface()
 
 
+def generate_full_report():
+    """Top 5 리스크 전체에 대한 보고서 생성"""
+    progress = st.progress(0.0, text="📄 리포트를 생성 중입니다...")
+    total = len(st.session_state.risks)
+    
+    def on_section(index, title):
+        progress.progress((index + 1) / total, text=f"✅ {index + 1}/{total} {title}")
+    
+    try:
+        data, stats = build_risk_report(
+            st.session_state.rag_engine,
+            st.session_state.risks,
+            system_prompt=st.session_state.system_prompt,
+            persona_1_prompt=st.session_state.persona_1_prompt,
+            persona_2_prompt=st.session_state.persona_2_prompt,
+            persona_3_prompt=st.session_state.persona_3_prompt,
+            on_section=on_section
+        )
+        st.session_state.risk_report = {'data': data, 'stats': stats}
+    except Exception as e:
+        st.error(f"❌ 리포트 생성 중 오류가 발생했습니다: {str(e)}")
+    finally:
+        progress.empty()
+
+
 def render_chat_interface():
     """채팅 인터페이스 렌더링"""
     st.write(f"### 💬 선택된 리스크: {st.session_state.selected_risk['title']}")
@@ -512,6 +681,7 @@ def process_user_question(question: str):
 def main():
     """메인 함수"""
     initialize_session_state()
+    track_session()
     render_sidebar()
     render_main_area()
 
@@ -0,0 +1,269 @@
+"""
+모델 라우팅: 작업(리스크 분석, 페르소나 답변, 추천 질문, 요약)별 모델 등급·온도·최대 토큰 설정
+- 작업별 지연 시간 예산을 넘기면 더 빠른 등급의 모델로 대체
+- 재시도와 대체 호출을 포함한 모든 시도는 LLM 게이트웨이에서 슬롯과 토큰을 새로 확보
+- 작업별 지연 시간과 토큰 사용량을 기록하여 라우팅 표를 실제 데이터로 조정할 수 있도록 함
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+import openai
+from langchain_openai import ChatOpenAI
+
+from llm_gateway import LLMGateway, Priority, get_gateway
+
+# 모델 등급 (환경변수로 조정 가능)
+MODEL_TIERS = {
+    "flagship": os.getenv("LLM_FLAGSHIP_MODEL", "gpt-4o"),
+    "fast": os.getenv("LLM_FAST_MODEL", "gpt-4o-mini"),
+}
+
+# 예산 초과(시간 초과)나 반복 오류 후 이 시간(초) 동안은 처음부터 대체 모델을 사용
+FALLBACK_COOLDOWN_SECONDS = 60
+
+# 일시적 오류(429, 5xx, 연결 오류) 재시도 횟수와 첫 대기 시간(초, 재시도마다 2배)
+# SDK 자동 재시도는 끄고 여기서 재시도합니다. (재시도마다 게이트웨이 속도 제한을 거치고, 대기 중에는 슬롯을 반납)
+MAX_RETRIES = 2
+RETRY_BACKOFF_SECONDS = 1.0
+
+# 지연 시간 통계에 보관하는 최근 표본 수
+LATENCY_SAMPLE_SIZE = 500
+
+
+# 재시도 대상 오류 (APITimeoutError도 APIConnectionError의 하위 클래스이므로 먼저 구분)
+_RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+
+class Task(str, Enum):
+    """LLM 호출 작업 종류"""
+    RISK_ANALYSIS = "risk_analysis"    # Risk Top 5 분석
+    PERSONA_ANSWER = "persona_answer"  # 3개 페르소나 답변 (대화, 보고서)
+    FOLLOW_UPS = "follow_ups"          # 추천 질문 생성
+    SUMMARY = "summary"                # 요약/맵 단계
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """작업별 모델 설정"""
+    model: str
+    temperature: float = 0.3
+    max_tokens: Optional[int] = None
+    latency_budget_seconds: Optional[float] = None  # 초과 시 fallback_model로 대체 (None이면 제한 없음)
+    fallback_model: Optional[str] = None
+
+
+DEFAULT_ROUTES = {
+    Task.RISK_ANALYSIS: ModelRoute(MODEL_TIERS["flagship"], 0.3, 4096, 120.0, MODEL_TIERS["fast"]),
+    Task.PERSONA_ANSWER: ModelRoute(MODEL_TIERS["flagship"], 0.3, None, 60.0, MODEL_TIERS["fast"]),  # 4개 섹션 답변이 잘리지 않도록 제한 없음
+    Task.FOLLOW_UPS: ModelRoute(MODEL_TIERS["fast"], 0.3, 300, 15.0),
+    Task.SUMMARY: ModelRoute(MODEL_TIERS["fast"], 0.2, 1024, 30.0),
+}
+
+
+def _latency_summary(samples) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+        "p95": ordered[int(len(ordered) * 0.95)] if ordered else 0.0,
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+class UsageStats:
+    """작업·모델별 호출 수, 대체 횟수, 지연 시간, 토큰 사용량 (프로세스 전역)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[str, str], int] = {}
+        self._latencies: Dict[Tuple[str, str], deque] = {}
+        self._tokens: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._fallbacks: Dict[str, int] = {}
+        self._fell_back_at: Dict[Tuple[str, str], float] = {}
+
+    def record(self, task: Task, model: str, latency: float, response: Any):
+        """성공한 호출의 지연 시간과 토큰 사용량(usage_metadata) 기록"""
+        usage = getattr(response, "usage_metadata", None) or {}
+        key = (task.value, model)
+        with self._lock:
+            self._calls[key] = self._calls.get(key, 0) + 1
+            self._latencies.setdefault(key, deque(maxlen=LATENCY_SAMPLE_SIZE)).append(latency)
+            tokens = self._tokens.setdefault(key, {"input_tokens": 0, "output_tokens": 0})
+            tokens["input_tokens"] += usage.get("input_tokens", 0)
+            tokens["output_tokens"] += usage.get("output_tokens", 0)
+
+    def record_fallback(self, task: Task, model: str):
+        """대체 모델 사용 기록 (지연 예산 초과 또는 재시도 후에도 실패, 이후 쿨다운 동안 대체 모델 사용)"""
+        with self._lock:
+            self._fallbacks[task.value] = self._fallbacks.get(task.value, 0) + 1
+            self._fell_back_at[(task.value, model)] = time.monotonic()
+
+    def in_cooldown(self, task: Task, model: str) -> bool:
+        with self._lock:
+            fell_back_at = self._fell_back_at.get((task.value, model))
+        return fell_back_at is not None and time.monotonic() - fell_back_at < FALLBACK_COOLDOWN_SECONDS
+
+    def metrics(self) -> Dict[str, Any]:
+        """작업별 {"fallbacks", "models": {모델: {"calls", "latency_seconds", "input_tokens", "output_tokens"}}}"""
+        with self._lock:
+            result = {
+                task.value: {"fallbacks": self._fallbacks.get(task.value, 0), "models": {}}
+                for task in Task
+            }
+            for (task, model), calls in self._calls.items():
+                result[task]["models"][model] = {
+                    "calls": calls,
+                    "latency_seconds": _latency_summary(self._latencies[(task, model)]),
+                    **self._tokens[(task, model)],
+                }
+        return result
+
+
+_usage_stats = UsageStats()
+
+
+def get_usage_stats() -> UsageStats:
+    """프로세스 전역 작업별 사용량 통계를 반환합니다."""
+    return _usage_stats
+
+
+def _timed_invoke(client: ChatOpenAI, prompt: Any) -> Tuple[Any, float]:
+    """게이트웨이 슬롯 안에서 실행: (응답, 호출 시간) - 대기열 대기 시간은 지연 시간에 포함하지 않음"""
+    started = time.perf_counter()
+    response = client.invoke(prompt)
+    return response, time.perf_counter() - started
+
+
+async def _atimed_invoke(client: ChatOpenAI, prompt: Any) -> Tuple[Any, float]:
+    """_timed_invoke()의 비동기 버전"""
+    started = time.perf_counter()
+    response = await client.ainvoke(prompt)
+    return response, time.perf_counter() - started
+
+
+class ModelRouter:
+    """
+    작업별 라우팅 표에 따라 ChatOpenAI 클라이언트를 선택하여 호출합니다.
+    지연 시간 예산이 있는 작업은 예산을 요청 시간 제한으로 사용하고,
+    시간을 초과하거나 일시적 오류가 재시도 후에도 계속되면 fallback_model로 다시 호출합니다.
+    각 시도는 gateway.call()로 실행하므로 재시도와 대체 호출도 속도 제한·우선순위 대기열을 거칩니다.
+    """
+
+    def __init__(
+        self,
+        openai_api_key: str,
+        routes: Optional[Dict[Task, ModelRoute]] = None,
+        gateway: Optional[LLMGateway] = None
+    ):
+        self.openai_api_key = openai_api_key
+        self.routes = {**DEFAULT_ROUTES, **(routes or {})}
+        self.gateway = gateway or get_gateway()
+        self.stats = get_usage_stats()
+        self._clients: Dict[ModelRoute, ChatOpenAI] = {}
+        self._clients_lock = threading.Lock()
+
+    def route(self, task: Task) -> ModelRoute:
+        return self.routes[task]
+
+    def _client(self, route: ModelRoute) -> ChatOpenAI:
+        """라우트 설정별 클라이언트 (재사용)"""
+        with self._clients_lock:
+            client = self._clients.get(route)
+            if client is None:
+                options = {}
+                if route.latency_budget_seconds is not None:
+                    options["timeout"] = route.latency_budget_seconds
+                client = ChatOpenAI(
+                    model=route.model,
+                    temperature=route.temperature,
+                    max_tokens=route.max_tokens,
+                    openai_api_key=self.openai_api_key,
+                    # SDK 재시도는 끄고 직접 재시도 (MAX_RETRIES, 시간 초과는 재시도하지 않고 대체 모델로)
+                    max_retries=0,
+                    **options
+                )
+                self._clients[route] = client
+            return client
+
+    def _plan(self, task: Task) -> Tuple[ModelRoute, Optional[ModelRoute]]:
+        """(이번에 호출할 라우트, 시간 초과 시 대체 라우트)"""
+        route = self.route(task)
+        if route.fallback_model is None:
+            return route, None
+        fallback = replace(route, model=route.fallback_model, latency_budget_seconds=None, fallback_model=None)
+        if self.stats.in_cooldown(task, route.model):
+            return fallback, None
+        return route, fallback
+
+    def _invoke_route(self, task: Task, route: ModelRoute, prompt: Any, priority: Priority) -> Any:
+        client = self._client(route)
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response, latency = self.gateway.call(_timed_invoke, client, prompt, priority=priority)
+                break
+            except openai.APITimeoutError:
+                raise
+            except _RETRYABLE_ERRORS:
+                if attempt == MAX_RETRIES:
+                    raise
+                time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+        return self._finish(task, route, latency, response)
+
+    async def _ainvoke_route(self, task: Task, route: ModelRoute, prompt: Any, priority: Priority) -> Any:
+        client = self._client(route)
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response, latency = await self.gateway.acall(_atimed_invoke, client, prompt, priority=priority)
+                break
+            except openai.APITimeoutError:
+                raise
+            except _RETRYABLE_ERRORS:
+                if attempt == MAX_RETRIES:
+                    raise
+                await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+        return self._finish(task, route, latency, response)
+
+    def _finish(self, task: Task, route: ModelRoute, latency: float, response: Any) -> Any:
+        """사용량 기록 후, 실제로 답변한 라우트 모델을 응답 메타데이터에 표시 (routed_model)"""
+        self.stats.record(task, route.model, latency, response)
+        metadata = getattr(response, "response_metadata", None)
+        if isinstance(metadata, dict):
+            metadata["routed_model"] = route.model
+        return response
+
+    def answered_by_primary(self, task: Task, response: Any) -> bool:
+        """응답이 대체 모델이 아닌 라우팅 표의 기본 모델에서 나왔는지 (답변 캐시 저장 여부 판단용)"""
+        metadata = getattr(response, "response_metadata", None) or {}
+        return metadata.get("routed_model") == self.route(task).model
+
+    def invoke(self, task: Task, prompt: Any, priority: Priority = Priority.INTERACTIVE) -> Any:
+        """
+        작업에 맞는 모델로 호출합니다.
+        일시적 오류는 재시도하고, 예산 초과(시간 초과)나 재시도 후에도 남는 오류는 대체 모델로 다시 호출합니다.
+        각 시도는 priority로 게이트웨이 대기열에 다시 들어갑니다.
+        """
+        route, fallback = self._plan(task)
+        try:
+            return self._invoke_route(task, route, prompt, priority)
+        except (openai.APITimeoutError, *_RETRYABLE_ERRORS):
+            if fallback is None:
+                raise
+            self.stats.record_fallback(task, route.model)
+            return self._invoke_route(task, fallback, prompt, priority)
+
+    async def ainvoke(self, task: Task, prompt: Any, priority: Priority = Priority.INTERACTIVE) -> Any:
+        """invoke()의 비동기 버전"""
+        route, fallback = self._plan(task)
+        try:
+            return await self._ainvoke_route(task, route, prompt, priority)
+        except (openai.APITimeoutError, *_RETRYABLE_ERRORS):
+            if fallback is None:
+                raise
+            self.stats.record_fallback(task, route.model)
+            return await self._ainvoke_route(task, fallback, prompt, priority)
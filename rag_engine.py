@@ -1,40 +1,204 @@
 """
 RAG 엔진: ChromaDB 및 LangChain 로직
 """
+import asyncio
 import os
-from typing import List, Tuple, Dict, Any
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import List, Tuple, Dict, Any, Iterable, Iterator, Optional
 import chromadb
 # from chromadb.config import Settings (구버전 코드 삭제)
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 import tiktoken
 
+from llm_gateway import Priority, get_gateway, request_key
+from timeline_index import TimelineIndex
+from dedup import DEFAULT_DEDUP_THRESHOLD, NearDuplicateIndex
+from model_router import ModelRoute, ModelRouter, Task
+
+# 스트리밍 적재 시 기본 임베딩/저장 배치 크기
+DEFAULT_INGEST_BATCH_SIZE = 256
+
+# 페르소나 할당량이 없을 때의 카테고리별 최소 검색 청크 수 (작업일보 등에 계약 조항이 밀리지 않도록)
+DEFAULT_CATEGORY_QUOTAS = {"계약서": 2}
+
+# 페르소나별 카테고리 검색 할당량 (답변 생성 시 세 페르소나의 검색 결과를 합쳐 컨텍스트로 사용)
+PERSONA_CATEGORY_QUOTAS = {
+    "원도급사": {"공문서": 1, "작업일보": 1},
+    "발주처": {"계약서": 2},
+    "중재자": {"계약서": 1, "회의록": 1},
+}
+
+# 답변 생성 시 페르소나별로 검색하는 청크 수 (결과는 합집합으로 사용)
+# 할당량 합계보다 커야 남은 자리가 전체 검색 결과(이메일, 기타 등 할당량 없는 카테고리 포함)로 채워짐
+PERSONA_TOP_K = 4
+
+# 카테고리별 동시 검색 스레드 수
+RETRIEVAL_WORKERS = 8
+
+# 답변 캐시에 보관하는 최대 답변 수
+ANSWER_CACHE_SIZE = 64
+
+# HNSW 인덱스 기본 파라미터 (ChromaDB 기본값과 동일, hnsw_tuner.tune_hnsw로 조정 가능)
+DEFAULT_HNSW_PARAMS = {
+    "hnsw:M": 16,
+    "hnsw:construction_ef": 100,
+    "hnsw:search_ef": 10,
+}
+
+
+def answer_query(risk_title: str, question: str) -> str:
+    """답변 생성 시 사용하는 검색 질의"""
+    return f"{risk_title} {question}"
+
+
+def _merge_quota_results(
+    category_results: List[List[Dict[str, Any]]],
+    global_results: List[Dict[str, Any]],
+    top_k: int
+) -> List[Dict[str, Any]]:
+    """할당량 결과 우선 → 남은 자리는 전체 검색 결과로 채움 (중복 제외, 거리순 정렬)"""
+    selected = []
+    seen_ids = set()
+    candidates = [doc for results in category_results for doc in results] + global_results
+    for doc in candidates:
+        if len(selected) >= top_k:
+            break
+        if doc['id'] in seen_ids:
+            continue
+        seen_ids.add(doc['id'])
+        selected.append(doc)
+    
+    return sorted(selected, key=lambda doc: doc['distance'])
+
+
+def _union_results(results: Iterable[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """여러 검색 결과의 합집합 (같은 청크는 한 번만, 거리순 정렬)"""
+    merged = {}
+    for docs in results:
+        for doc in docs:
+            merged.setdefault(doc['id'], doc)
+    return sorted(merged.values(), key=lambda doc: doc['distance'])
+
+
+def _risk_analysis_prompt(documents_text: str) -> str:
+    """Risk Top 5 분석 프롬프트"""
+    from prompts import RISK_ANALYSIS_PROMPT
+    
+    return RISK_ANALYSIS_PROMPT.format(documents=documents_text[:15000])  # 토큰 제한
+
+
+def _follow_up_prompt(risk_title: str, conversation_history: str) -> str:
+    """추가 질문 생성 프롬프트"""
+    return f"""다음 클레임 리스크와 대화 내용을 바탕으로, 사용자가 추가로 궁금해할 만한 질문 3개를 제안해주세요.
+
+**리스크**: {risk_title}
+
+**대화 내용**:
+{conversation_history[-1000:]}
+
+각 질문은 한 줄로 작성하고, 번호를 붙여 다음 형식으로 작성해주세요:
+1. [질문1]
+2. [질문2]
+3. [질문3]
+
+질문은 구체적이고 실용적이어야 하며, 법적/기술적/계약적 관점을 다양하게 포함해야 합니다."""
+
+
+def _parse_follow_up_questions(content: str) -> List[str]:
+    """LLM 응답에서 번호가 붙은 질문을 최대 3개 추출"""
+    # 응답 파싱
+    questions = []
+    for line in content.split('\n'):
+        line = line.strip()
+        if line and (line[0].isdigit() or line.startswith('-') or line.startswith('•')):
+            # 번호 제거
+            try:
+                question = line.split('.', 1)[-1].strip()
+            except:
+                question = line
+            question = question.lstrip('-').lstrip('•').strip()
+            if question:
+                questions.append(question)
+    
+    return questions[:3]
+
+
+def _stored_columns(batch: List[Tuple[str, Dict[str, Any], str, Optional[str]]]) -> Tuple[List[str], List[Dict[str, Any]], List[str]]:
+    """_iter_chunks() 배치에서 벡터 DB에 저장할 청크(중복이 아닌 청크)만 (청크, 메타데이터, ID) 열로 분리"""
+    stored = [(chunk, metadata, chunk_id) for chunk, metadata, chunk_id, canonical in batch if canonical is None]
+    if not stored:
+        return [], [], []
+    chunks, metadatas, ids = (list(column) for column in zip(*stored))
+    return chunks, metadatas, ids
+
+
+def _iter_batches(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """이터러블을 batch_size 크기의 리스트로 묶어 순서대로 내보냅니다."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
 class RAGEngine:
     """RAG 엔진 클래스"""
     
-    def __init__(self, openai_api_key: str):
+    def __init__(
+        self,
+        openai_api_key: str,
+        ingest_batch_size: int = DEFAULT_INGEST_BATCH_SIZE,
+        hnsw_params: Optional[Dict[str, int]] = None,
+        dedup_threshold: Optional[float] = DEFAULT_DEDUP_THRESHOLD,
+        model_routes: Optional[Dict[Task, ModelRoute]] = None
+    ):
         """
         RAG 엔진 초기화
         Args:
             openai_api_key: OpenAI API 키
+            ingest_batch_size: 문서 적재 시 임베딩/저장 배치 크기
+            hnsw_params: HNSW 인덱스 파라미터 ("hnsw:M", "hnsw:construction_ef", "hnsw:search_ef")
+            dedup_threshold: 유사 중복 판정 임계값 (추정 Jaccard 유사도, None이면 중복 제거 안 함)
+            model_routes: 작업별 모델 설정 (지정한 작업만 model_router.DEFAULT_ROUTES를 덮어씀)
         """
         self.openai_api_key = openai_api_key
+        self.ingest_batch_size = ingest_batch_size
+        self.hnsw_params = {**DEFAULT_HNSW_PARAMS, **(hnsw_params or {})}
+        self.dedup_threshold = dedup_threshold
+        self._reset_dedup()
+        self.last_ingest_stats = {}
+        
+        # 모든 LLM/임베딩 호출은 프로세스 전역 게이트웨이를 거칩니다. (속도 제한, 우선순위, 중복 요청 병합)
+        self.gateway = get_gateway()
         self.embeddings = OpenAIEmbeddings(openai_api_key=openai_api_key)
-        self.llm = ChatOpenAI(
-            model="gpt-4o",
-            temperature=0.3,
-            openai_api_key=openai_api_key
-        )
+        # 작업별 모델 라우팅 (리스크 분석/답변은 상위 모델, 추천 질문/요약은 빠른 모델)
+        self.router = ModelRouter(openai_api_key, model_routes, self.gateway)
         
         # ChromaDB 클라이언트 초기화 (최신 버전 호환 수정)
         # 로컬 저장소 경로 설정
         db_path = os.path.join(os.getcwd(), "chroma_db")
         self.chroma_client = chromadb.PersistentClient(path=db_path)
         
+        # 날짜·기간·금액 사건 인덱스 (적재 시 함께 생성)
+        self.timeline = TimelineIndex(os.path.join(db_path, "timeline.sqlite3"))
+        
         self.collection_name = "construction_documents"
         self.collection = None
         
+        # 카테고리별 동시 검색용 스레드 풀
+        self._query_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS)
+        
+        # 답변 캐시 (프롬프트 → 답변, LRU)
+        self._answer_cache = OrderedDict()
+        self._answer_cache_lock = threading.Lock()
+        
         # 텍스트 분할기
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
@@ -50,76 +214,285 @@ class RAGEngine:
         except:
             return len(text) // 4 # 예외 발생 시 대략적인 계산
     
-    def reset_database(self):
-        """데이터베이스 초기화 (기존 컬렉션 삭제 후 재생성)"""
+    def _collection_metadata(self) -> Dict[str, Any]:
+        """컬렉션 생성용 metadata (코사인 유사도 + HNSW 파라미터)"""
+        return {"hnsw:space": "cosine", **self.hnsw_params}
+    
+    def _invoke_llm(self, task: Task, prompt: Any, priority: Priority) -> Any:
+        """게이트웨이를 통한 LLM 호출 (작업별 라우팅, 동일 라우트·프롬프트의 동시 요청은 한 번만 실행)"""
+        key = request_key("chat", task.value, self.router.route(task), prompt)
+        # 시도마다 라우터가 게이트웨이 슬롯을 확보하므로 여기서는 동일 요청 병합만 적용
+        return self.gateway.coalesce(self.router.invoke, task, prompt, priority, key=key)
+    
+    def _embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """게이트웨이를 통한 문서 임베딩 (일괄 작업 우선순위)"""
+        return self.gateway.call(self.embeddings.embed_documents, texts, priority=Priority.BATCH)
+    
+    def _embed_query(self, query: str, priority: Priority = Priority.INTERACTIVE) -> List[float]:
+        """게이트웨이를 통한 질의 임베딩"""
+        key = request_key("embed_query", self.embeddings.model, query)
+        return self.gateway.call(self.embeddings.embed_query, query, priority=priority, key=key)
+    
+    async def _run_blocking(self, fn, *args, **kwargs) -> Any:
+        """블로킹 호출(ChromaDB, SQLite 등)을 검색용 스레드 풀에서 실행합니다. (이벤트 루프를 막지 않음)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._query_executor, partial(fn, *args, **kwargs))
+    
+    async def _ainvoke_llm(self, task: Task, prompt: Any, priority: Priority) -> Any:
+        """_invoke_llm()의 비동기 버전 (동기 호출과 같은 키로 중복 요청 병합)"""
+        key = request_key("chat", task.value, self.router.route(task), prompt)
+        return await self.gateway.acoalesce(self.router.ainvoke, task, prompt, priority, key=key)
+    
+    async def _aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """_embed_documents()의 비동기 버전"""
+        return await self.gateway.acall(self.embeddings.aembed_documents, texts, priority=Priority.BATCH)
+    
+    async def _aembed_query(self, query: str, priority: Priority = Priority.INTERACTIVE) -> List[float]:
+        """_embed_query()의 비동기 버전"""
+        key = request_key("embed_query", self.embeddings.model, query)
+        return await self.gateway.acall(self.embeddings.aembed_query, query, priority=priority, key=key)
+    
+    def reset_database(self, hnsw_params: Optional[Dict[str, int]] = None):
+        """
+        데이터베이스 초기화 (기존 컬렉션 삭제 후 재생성)
+        Args:
+            hnsw_params: 지정하면 이 HNSW 파라미터로 컬렉션을 생성합니다.
+        """
+        if hnsw_params:
+            self.hnsw_params = {**self.hnsw_params, **hnsw_params}
+        
         try:
             self.chroma_client.delete_collection(name=self.collection_name)
         except:
             pass
+        self.timeline.reset()
+        self._reset_dedup()
         
-        # create_collection 호출 시 metadata 설정 (코사인 유사도)
+        # create_collection 호출 시 metadata 설정 (코사인 유사도, HNSW 파라미터)
         self.collection = self.chroma_client.get_or_create_collection(
             name=self.collection_name,
-            metadata={"hnsw:space": "cosine"}
+            metadata=self._collection_metadata()
         )
     
-    def add_documents(self, documents: List[Tuple[str, str, str]]):
+    def _max_batch_size(self) -> Optional[int]:
+        """ChromaDB가 한 번의 add 호출에서 허용하는 최대 레코드 수"""
+        try:
+            if hasattr(self.chroma_client, "get_max_batch_size"):
+                return self.chroma_client.get_max_batch_size()
+            return self.chroma_client.max_batch_size
+        except Exception:
+            return None
+    
+    @staticmethod
+    def _iter_segments(content: Any) -> Iterable[Tuple[Dict[str, Any], str]]:
+        """문서 내용(텍스트, 구간 리스트/제너레이터, iter_segments()를 가진 문서 핸들)을 구간으로 변환"""
+        if isinstance(content, str):
+            return [({}, content)]
+        if hasattr(content, "iter_segments"):
+            return content.iter_segments()
+        return content
+    
+    def _reset_dedup(self):
+        """유사 중복 인덱스와 중복 → 원본 연결 정보 초기화"""
+        self._document_dedup = NearDuplicateIndex(threshold=self.dedup_threshold) if self.dedup_threshold else None
+        self._chunk_dedup = NearDuplicateIndex(threshold=self.dedup_threshold) if self.dedup_threshold else None
+        self.duplicate_documents: Dict[str, str] = {}  # 중복 문서 파일명 → 원본 문서 파일명
+        self.duplicate_links: Dict[str, str] = {}      # 중복 청크 ID → 원본 청크 ID
+        self.duplicate_sources: Dict[str, List[Dict[str, Any]]] = {}  # 원본 청크 ID → 중복 청크 메타데이터
+        self._document_chunk_ids: Dict[str, List[str]] = {}  # 저장된 문서 파일명 → 위치별 (원본) 청크 ID
+    
+    def _iter_chunks(self, documents: Iterable[Tuple[str, str, Any]], stats: Optional[Dict[str, int]] = None) -> Iterator[Tuple[str, Dict[str, Any], str, Optional[str]]]:
+        """
+        문서를 (청크, 메타데이터, ID, 원본 청크 ID) 단위로 분할하는 제너레이터
+        한 번에 하나의 구간만 분할하므로 전체 문서 텍스트를 동시에 들고 있지 않습니다.
+        유사 중복 문서/청크도 내보내되 원본 청크 ID를 함께 전달합니다. (원본 청크 ID가 None인 청크만 벡터 DB에 저장)
+        중복 청크는 임베딩하지 않지만 타임라인 인덱스에는 반영하여 날짜가 다른 사실 정보가 사라지지 않도록 합니다.
+        """
+        stats = stats if stats is not None else {}
+        doc_id = 0
+        for category, filename, content in documents:
+            # 문서 단위 중복 검사 (다시 읽을 수 있는 내용만: 텍스트, 리스트, 문서 핸들)
+            canonical_document = None
+            if self._document_dedup is not None and (isinstance(content, (str, list, tuple)) or hasattr(content, "iter_segments")):
+                signature = self._document_dedup.hasher.empty()
+                for _, text in self._iter_segments(content):
+                    signature = self._document_dedup.hasher.update(signature, text)
+                canonical_document = self._document_dedup.find_or_add_signature(filename, signature)
+                if canonical_document is not None:
+                    self.duplicate_documents[filename] = canonical_document
+                    stats["duplicate_documents"] = stats.get("duplicate_documents", 0) + 1
+            canonical_document_chunks = self._document_chunk_ids.get(canonical_document, []) if canonical_document else []
+            
+            document_chunk_ids = []
+            chunk_index = 0
+            for segment_metadata, text in self._iter_segments(content):
+                # 텍스트를 청크로 분할 (구간 경계를 넘지 않도록 구간별로 분할)
+                chunks = self.text_splitter.split_text(text)
+                
+                for chunk in chunks:
+                    i = chunk_index
+                    chunk_index += 1
+                    if len(chunk.strip()) < 50:  # 너무 짧은 청크 제외
+                        continue
+                    
+                    metadata = {
+                        "category": category,
+                        "filename": filename,
+                        "chunk_index": i,
+                        **segment_metadata
+                    }
+                    chunk_id = f"doc_{doc_id}_chunk_{i}"
+                    doc_id += 1
+                    
+                    canonical = None
+                    if self._chunk_dedup is not None:
+                        if canonical_document_chunks:
+                            # 중복 문서: 원본 문서의 같은 내용 청크, 없으면 같은 위치의 청크와 연결 (인용용)
+                            canonical = self._chunk_dedup.query(self._chunk_dedup.hasher.signature(chunk))
+                            if canonical is None:
+                                position = min(len(document_chunk_ids), len(canonical_document_chunks) - 1)
+                                canonical = canonical_document_chunks[position]
+                        else:
+                            # 청크 단위 중복 검사 (인용된 메일 본문, 반복되는 머리말 등)
+                            canonical = self._chunk_dedup.find_or_add(chunk_id, chunk)
+                            if canonical is not None:
+                                stats["duplicate_chunks"] = stats.get("duplicate_chunks", 0) + 1
+                    
+                    if canonical is not None:
+                        self.duplicate_links[chunk_id] = canonical
+                        self.duplicate_sources.setdefault(canonical, []).append(metadata)
+                        stats["tokens_saved"] = stats.get("tokens_saved", 0) + self._count_tokens(chunk)
+                    
+                    document_chunk_ids.append(canonical or chunk_id)
+                    yield chunk, metadata, chunk_id, canonical
+            
+            if canonical_document is None:
+                self._document_chunk_ids[filename] = document_chunk_ids
+    
+    def add_documents(self, documents: Iterable[Tuple[str, str, Any]], batch_size: Optional[int] = None) -> Dict[str, int]:
         """
         문서 추가 (카테고리, 파일명, 텍스트)
+        문서 → 청크 → 임베딩 배치 → 배치 저장 순서의 스트리밍 파이프라인으로 처리합니다.
+        청크 텍스트와 임베딩은 임베딩 중인 배치와 저장 중인 배치 최대 2개만 메모리에 유지합니다.
+        유사 중복 인덱스(원본 청크당 약 1.5KB)와 중복 → 원본 연결 정보는
+        코퍼스 크기에 비례하여 늘어납니다. (dedup_threshold=None이면 유지하지 않음)
         Args:
-            documents: [(카테고리, 파일명, 텍스트), ...] 형태의 리스트
+            documents: [(카테고리, 파일명, 텍스트 또는 구간 리스트 또는 문서 핸들), ...] 형태의 리스트 또는 제너레이터
+                구간 리스트는 [(구간 메타데이터 dict, 텍스트), ...] 형태이며,
+                구간 메타데이터(예: {"page": 213})는 각 청크의 메타데이터로 전달됩니다.
+            batch_size: 임베딩 및 저장 배치 크기 (기본값: self.ingest_batch_size)
+        Returns:
+            처리 통계 {"chunks": 저장된 청크 수, "batches": 배치 수, "events": 추출된 타임라인 사건 수,
+                       "duplicate_documents"/"duplicate_chunks": 유사 중복으로 제외된 문서/청크 수
+                       (중복 문서의 청크는 duplicate_chunks에 포함하지 않음),
+                       "tokens_saved": 제외된 청크(중복 문서의 청크 포함)의 임베딩 토큰 수}
         """
         if self.collection is None:
             self.reset_database()
         
-        all_chunks = []
-        all_metadatas = []
-        all_ids = []
+        batch_size = batch_size or self.ingest_batch_size
+        max_batch_size = self._max_batch_size()
+        if max_batch_size:
+            batch_size = min(batch_size, max_batch_size)
         
-        doc_id = 0
-        for category, filename, text in documents:
-            # 텍스트를 청크로 분할
-            chunks = self.text_splitter.split_text(text)
-            
-            for i, chunk in enumerate(chunks):
-                if len(chunk.strip()) < 50:  # 너무 짧은 청크 제외
+        stats = {"chunks": 0, "batches": 0, "events": 0, "duplicate_documents": 0, "duplicate_chunks": 0, "tokens_saved": 0}
+        pending = None  # 저장 중인 직전 배치
+        
+        # 임베딩(네트워크)과 저장(디스크)을 겹쳐서 실행하되, 저장 대기 배치는 1개로 제한 (backpressure)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            for batch in _iter_batches(self._iter_chunks(documents, stats), batch_size):
+                # 타임라인은 중복 청크까지 모두 반영 (같은 양식의 작업일보도 날짜·사건은 서로 다름)
+                all_chunks, all_metadatas, all_ids, _ = zip(*batch)
+                stats["events"] += self.timeline.add_chunks(all_ids, all_chunks, all_metadatas)
+                
+                chunks, metadatas, ids = _stored_columns(batch)
+                if not chunks:
                     continue
+                embeddings_list = self._embed_documents(chunks)
                 
-                all_chunks.append(chunk)
-                all_metadatas.append({
-                    "category": category,
-                    "filename": filename,
-                    "chunk_index": i
-                })
-                all_ids.append(f"doc_{doc_id}_chunk_{i}")
-                doc_id += 1
-        
-        # 임베딩 생성 및 저장
-        if all_chunks:
-            embeddings_list = self.embeddings.embed_documents(all_chunks)
+                if pending is not None:
+                    pending.result()
+                pending = executor.submit(
+                    self.collection.add,
+                    embeddings=embeddings_list,
+                    documents=chunks,
+                    metadatas=metadatas,
+                    ids=ids
+                )
+                
+                stats["chunks"] += len(chunks)
+                stats["batches"] += 1
             
-            self.collection.add(
-                embeddings=embeddings_list,
-                documents=all_chunks,
-                metadatas=all_metadatas,
-                ids=all_ids
-            )
+            if pending is not None:
+                pending.result()
+        
+        self.last_ingest_stats = stats
+        return stats
     
-    def retrieve_relevant_documents(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    async def aadd_documents(self, documents: Iterable[Tuple[str, str, Any]], batch_size: Optional[int] = None) -> Dict[str, int]:
         """
-        질의와 관련된 문서 검색
+        add_documents()의 비동기 버전
+        청크 분할·저장은 스레드 풀에서, 임베딩은 비동기 클라이언트로 실행하며
+        저장 대기 배치는 1개로 제한합니다. (backpressure)
         """
         if self.collection is None:
-            return []
+            await self._run_blocking(self.reset_database)
         
-        # 질의 임베딩
-        query_embedding = self.embeddings.embed_query(query)
+        batch_size = batch_size or self.ingest_batch_size
+        max_batch_size = self._max_batch_size()
+        if max_batch_size:
+            batch_size = min(batch_size, max_batch_size)
         
-        # 유사도 검색
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k
-        )
+        stats = {"chunks": 0, "batches": 0, "events": 0, "duplicate_documents": 0, "duplicate_chunks": 0, "tokens_saved": 0}
+        batches = _iter_batches(self._iter_chunks(documents, stats), batch_size)
+        pending = None  # 저장 중인 직전 배치
+        
+        try:
+            while True:
+                # 문서 추출/분할은 블로킹 작업이므로 스레드 풀에서 다음 배치를 가져옴
+                batch = await self._run_blocking(next, batches, None)
+                if batch is None:
+                    break
+                # 타임라인은 중복 청크까지 모두 반영
+                all_chunks, all_metadatas, all_ids, _ = zip(*batch)
+                stats["events"] += await self._run_blocking(self.timeline.add_chunks, all_ids, all_chunks, all_metadatas)
+                
+                chunks, metadatas, ids = _stored_columns(batch)
+                if not chunks:
+                    continue
+                embeddings_list = await self._aembed_documents(chunks)
+                
+                if pending is not None:
+                    await pending
+                pending = asyncio.ensure_future(self._run_blocking(
+                    self.collection.add,
+                    embeddings=embeddings_list,
+                    documents=chunks,
+                    metadatas=metadatas,
+                    ids=ids
+                ))
+                
+                stats["chunks"] += len(chunks)
+                stats["batches"] += 1
+        finally:
+            if pending is not None:
+                await pending
+        
+        self.last_ingest_stats = stats
+        return stats
+    
+    def _query_collection(self, query_embedding: List[float], n_results: int, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """임베딩 벡터로 컬렉션을 검색하고 결과를 포맷팅합니다. (where: 메타데이터 필터)"""
+        try:
+            results = self.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                where=where
+            )
+        except Exception as e:
+            # 필터 조건에 해당하는 청크가 없거나 요청 수보다 적은 경우
+            print(f"Error querying collection (where={where}): {e}")
+            return []
         
         # 결과 포맷팅
         documents = []
@@ -127,50 +500,261 @@ class RAGEngine:
         if results and 'documents' in results and results['documents']:
             # results['documents'][0]은 첫 번째 쿼리에 대한 결과 리스트
             docs_list = results['documents'][0]
+            ids_list = results['ids'][0] if 'ids' in results and results['ids'] else [None] * len(docs_list)
             metadatas_list = results['metadatas'][0] if 'metadatas' in results and results['metadatas'] else [{}] * len(docs_list)
             distances_list = results['distances'][0] if 'distances' in results and results['distances'] else [0] * len(docs_list)
 
             for i, doc_content in enumerate(docs_list):
                 documents.append({
+                    'id': ids_list[i],
                     'content': doc_content,
                     'metadata': metadatas_list[i],
-                    'distance': distances_list[i]
+                    'distance': distances_list[i],
+                    # 같은 내용으로 판단되어 저장하지 않은 청크들의 출처 (인용용)
+                    'duplicates': self.duplicate_sources.get(ids_list[i], [])
                 })
         
         return documents
     
+    def retrieve_relevant_documents(
+        self,
+        query: str,
+        top_k: int = 5,
+        category_quotas: Optional[Dict[str, int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        질의와 관련된 문서 검색
+        Args:
+            query: 검색 질의
+            top_k: 반환할 최대 청크 수
+            category_quotas: 카테고리별 최소 포함 청크 수 (예: {"계약서": 2})
+                지정하면 카테고리별 필터 검색과 전체 검색을 동시에 실행한 뒤,
+                할당량을 먼저 채우고 남은 자리를 전체 검색 결과로 채웁니다.
+        """
+        if self.collection is None:
+            return []
+        
+        # 질의 임베딩 (모든 검색에서 공유)
+        query_embedding = self._embed_query(query)
+        return self._retrieve_with_embedding(query_embedding, top_k, category_quotas)
+    
+    async def aretrieve_relevant_documents(
+        self,
+        query: str,
+        top_k: int = 5,
+        category_quotas: Optional[Dict[str, int]] = None,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> List[Dict[str, Any]]:
+        """retrieve_relevant_documents()의 비동기 버전 (카테고리별 검색을 동시에 실행)"""
+        if self.collection is None:
+            return []
+        
+        query_embedding = await self._aembed_query(query, priority)
+        return await self._aretrieve_with_embedding(query_embedding, top_k, category_quotas)
+    
+    async def _aretrieve_with_embedding(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        category_quotas: Optional[Dict[str, int]]
+    ) -> List[Dict[str, Any]]:
+        """_retrieve_with_embedding()의 비동기 버전"""
+        if not category_quotas:
+            return await self._run_blocking(self._query_collection, query_embedding, top_k)
+        
+        global_results, *category_results = await asyncio.gather(
+            self._run_blocking(self._query_collection, query_embedding, top_k),
+            *(
+                self._run_blocking(self._query_collection, query_embedding, quota, {"category": category})
+                for category, quota in category_quotas.items()
+                if quota > 0
+            )
+        )
+        return _merge_quota_results(category_results, global_results, top_k)
+    
+    def retrieve_many(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        """
+        여러 질의의 답변용 문서(retrieve_answer_context)를 한 번의 임베딩 호출로 묶어 검색합니다. (보고서 생성 등 일괄 작업용)
+        Returns:
+            질의 순서대로 검색 결과 리스트
+        """
+        if self.collection is None or not queries:
+            return [[] for _ in queries]
+        
+        query_embeddings = self._embed_documents(queries)
+        return [self._retrieve_answer_context(query_embedding) for query_embedding in query_embeddings]
+    
+    def _retrieve_with_embedding(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        category_quotas: Optional[Dict[str, int]]
+    ) -> List[Dict[str, Any]]:
+        """임베딩 벡터로 검색 (카테고리 할당량 적용)"""
+        if not category_quotas:
+            return self._query_collection(query_embedding, top_k)
+        
+        # 전체 검색 + 카테고리별 필터 검색을 동시에 실행
+        global_future = self._query_executor.submit(self._query_collection, query_embedding, top_k)
+        category_futures = [
+            self._query_executor.submit(self._query_collection, query_embedding, quota, {"category": category})
+            for category, quota in category_quotas.items()
+            if quota > 0
+        ]
+        
+        return _merge_quota_results(
+            [future.result() for future in category_futures],
+            global_future.result(),
+            top_k
+        )
+    
+    def retrieve_for_persona(self, query: str, persona: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        페르소나별 카테고리 가중치를 적용한 문서 검색 (예: 발주처 → 계약서 위주)
+        """
+        quotas = PERSONA_CATEGORY_QUOTAS.get(persona, DEFAULT_CATEGORY_QUOTAS)
+        return self.retrieve_relevant_documents(query, top_k=top_k, category_quotas=quotas)
+    
+    def retrieve_answer_context(self, query: str) -> List[Dict[str, Any]]:
+        """
+        답변 생성용 문서 검색: 세 페르소나 각각의 카테고리 가중치로 검색한 결과의 합집합
+        (원도급사 → 공문서·작업일보, 발주처 → 계약서, 중재자 → 계약서·회의록 근거가 모두 포함되도록)
+        """
+        if self.collection is None:
+            return []
+        return self._retrieve_answer_context(self._embed_query(query))
+    
+    def _retrieve_answer_context(self, query_embedding: List[float]) -> List[Dict[str, Any]]:
+        return _union_results(
+            self._retrieve_with_embedding(query_embedding, PERSONA_TOP_K, quotas)
+            for quotas in PERSONA_CATEGORY_QUOTAS.values()
+        )
+    
+    async def aretrieve_answer_context(self, query: str, priority: Priority = Priority.INTERACTIVE) -> List[Dict[str, Any]]:
+        """retrieve_answer_context()의 비동기 버전 (페르소나별 검색을 동시에 실행)"""
+        if self.collection is None:
+            return []
+        
+        query_embedding = await self._aembed_query(query, priority)
+        return _union_results(await asyncio.gather(*(
+            self._aretrieve_with_embedding(query_embedding, PERSONA_TOP_K, quotas)
+            for quotas in PERSONA_CATEGORY_QUOTAS.values()
+        )))
+    
     def generate_risk_analysis(self, documents_text: str) -> str:
         """Risk Top 5 분석 생성"""
-        from prompts import RISK_ANALYSIS_PROMPT
+        response = self._invoke_llm(Task.RISK_ANALYSIS, _risk_analysis_prompt(documents_text), Priority.BATCH)
+        return response.content
+    
+    async def agenerate_risk_analysis(self, documents_text: str) -> str:
+        """generate_risk_analysis()의 비동기 버전"""
+        response = await self._ainvoke_llm(Task.RISK_ANALYSIS, _risk_analysis_prompt(documents_text), Priority.BATCH)
+        return response.content
+    
+    def generate_answer(
+        self,
+        question: str,
+        risk_title: str,
+        system_prompt: str,
+        persona_1_prompt: str,
+        persona_2_prompt: str,
+        persona_3_prompt: str,
+        relevant_docs: Optional[List[Dict[str, Any]]] = None,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> str:
+        """
+        사용자 질문에 대한 답변 생성
+        Args:
+            relevant_docs: 미리 검색한 문서 (없으면 answer_query(risk_title, question)로 retrieve_answer_context 검색)
+            priority: LLM 호출 우선순위 (보고서 등 일괄 작업은 Priority.BATCH)
+        """
+        # 관련 문서 검색
+        if relevant_docs is None:
+            relevant_docs = self.retrieve_answer_context(answer_query(risk_title, question))
+        
+        messages = self._build_answer_messages(
+            question, risk_title, system_prompt,
+            persona_1_prompt, persona_2_prompt, persona_3_prompt,
+            relevant_docs
+        )
         
-        prompt = RISK_ANALYSIS_PROMPT.format(documents=documents_text[:15000])  # 토큰 제한
+        # 같은 프롬프트에 대한 답변은 캐시에서 재사용
+        cache_key = request_key(self.router.route(Task.PERSONA_ANSWER), messages)
+        cached = self._cached_answer(cache_key)
+        if cached is not None:
+            return cached
         
-        response = self.llm.invoke(prompt)
+        response = self._invoke_llm(Task.PERSONA_ANSWER, messages, priority)
+        # 대체 모델(지연 예산 초과·오류 시)의 답변은 쿨다운 이후 기본 모델 답변으로 재사용되지 않도록 저장하지 않음
+        if self.router.answered_by_primary(Task.PERSONA_ANSWER, response):
+            self._store_answer(cache_key, response.content)
         return response.content
     
-    def generate_answer(
+    async def agenerate_answer(
         self,
         question: str,
         risk_title: str,
         system_prompt: str,
         persona_1_prompt: str,
         persona_2_prompt: str,
-        persona_3_prompt: str
+        persona_3_prompt: str,
+        relevant_docs: Optional[List[Dict[str, Any]]] = None,
+        priority: Priority = Priority.INTERACTIVE
     ) -> str:
-        """사용자 질문에 대한 답변 생성"""
-        from prompts import CHATBOT_ANSWER_TEMPLATE
+        """generate_answer()의 비동기 버전 (답변 캐시를 동기 호출과 공유)"""
+        if relevant_docs is None:
+            relevant_docs = await self.aretrieve_answer_context(answer_query(risk_title, question), priority)
         
-        # 관련 문서 검색
-        relevant_docs = self.retrieve_relevant_documents(f"{risk_title} {question}", top_k=5)
+        # 타임라인 요약 조회(SQLite)가 포함되므로 스레드 풀에서 구성
+        messages = await self._run_blocking(
+            self._build_answer_messages,
+            question, risk_title, system_prompt,
+            persona_1_prompt, persona_2_prompt, persona_3_prompt,
+            relevant_docs
+        )
+        
+        cache_key = request_key(self.router.route(Task.PERSONA_ANSWER), messages)
+        cached = self._cached_answer(cache_key)
+        if cached is not None:
+            return cached
+        
+        response = await self._ainvoke_llm(Task.PERSONA_ANSWER, messages, priority)
+        # 대체 모델(지연 예산 초과·오류 시)의 답변은 쿨다운 이후 기본 모델 답변으로 재사용되지 않도록 저장하지 않음
+        if self.router.answered_by_primary(Task.PERSONA_ANSWER, response):
+            self._store_answer(cache_key, response.content)
+        return response.content
+    
+    def _build_answer_messages(
+        self,
+        question: str,
+        risk_title: str,
+        system_prompt: str,
+        persona_1_prompt: str,
+        persona_2_prompt: str,
+        persona_3_prompt: str,
+        relevant_docs: List[Dict[str, Any]]
+    ) -> List[Dict[str, str]]:
+        """검색 결과와 타임라인 요약으로 답변 생성용 메시지를 구성합니다."""
+        from prompts import CHATBOT_ANSWER_TEMPLATE
+        from utils import format_segment_location
         
         # 컨텍스트 구성
         context = ""
         for doc in relevant_docs:
             metadata = doc['metadata']
-            context += f"\n[{metadata.get('category', 'Unknown')} - {metadata.get('filename', 'Unknown')}]\n"
+            location = format_segment_location(metadata)
+            context += f"\n[{metadata.get('category', 'Unknown')} - {metadata.get('filename', 'Unknown')}"
+            context += f" {location}]" if location else "]"
+            duplicate_files = sorted({dup['filename'] for dup in doc.get('duplicates', [])} - {metadata.get('filename')})
+            context += f" (동일 내용: {', '.join(duplicate_files)})\n" if duplicate_files else "\n"
             context += f"{doc['content']}\n"
             context += "-" * 50 + "\n"
         
+        # 타임라인 요약 (날짜·기간·금액을 구조화하여 제공)
+        timeline_context = self.timeline.summary_context()
+        if timeline_context:
+            context = f"\n[타임라인 요약]\n{timeline_context}\n" + "-" * 50 + "\n" + context
+        
         # 프롬프트 생성
         full_prompt = CHATBOT_ANSWER_TEMPLATE.format(
             risk_title=risk_title,
@@ -181,45 +765,30 @@ class RAGEngine:
             persona_3_instruction=persona_3_prompt
         )
         
-        # LLM 호출
-        messages = [
+        return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": full_prompt}
         ]
-        
-        response = self.llm.invoke(messages)
-        return response.content
+    
+    def _cached_answer(self, cache_key: str) -> Optional[str]:
+        with self._answer_cache_lock:
+            if cache_key in self._answer_cache:
+                self._answer_cache.move_to_end(cache_key)
+                return self._answer_cache[cache_key]
+        return None
+    
+    def _store_answer(self, cache_key: str, answer: str):
+        with self._answer_cache_lock:
+            self._answer_cache[cache_key] = answer
+            while len(self._answer_cache) > ANSWER_CACHE_SIZE:
+                self._answer_cache.popitem(last=False)
     
     def generate_follow_up_questions(self, risk_title: str, conversation_history: str) -> List[str]:
         """추가 질문 3개 생성"""
-        prompt = f"""다음 클레임 리스크와 대화 내용을 바탕으로, 사용자가 추가로 궁금해할 만한 질문 3개를 제안해주세요.
-
-**리스크**: {risk_title}
-
-**대화 내용**:
-{conversation_history[-1000:]}
-
-각 질문은 한 줄로 작성하고, 번호를 붙여 다음 형식으로 작성해주세요:
-1. [질문1]
-2. [질문2]
-3. [질문3]
-
-질문은 구체적이고 실용적이어야 하며, 법적/기술적/계약적 관점을 다양하게 포함해야 합니다."""
-
-        response = self.llm.invoke(prompt)
-        
-        # 응답 파싱
-        questions = []
-        for line in response.content.split('\n'):
-            line = line.strip()
-            if line and (line[0].isdigit() or line.startswith('-') or line.startswith('•')):
-                # 번호 제거
-                try:
-                    question = line.split('.', 1)[-1].strip()
-                except:
-                    question = line
-                question = question.lstrip('-').lstrip('•').strip()
-                if question:
-                    questions.append(question)
-        
-        return questions[:3]
\ No newline at end of file
+        response = self._invoke_llm(Task.FOLLOW_UPS, _follow_up_prompt(risk_title, conversation_history), Priority.FOLLOW_UP)
+        return _parse_follow_up_questions(response.content)
+    
+    async def agenerate_follow_up_questions(self, risk_title: str, conversation_history: str) -> List[str]:
+        """generate_follow_up_questions()의 비동기 버전"""
+        response = await self._ainvoke_llm(Task.FOLLOW_UPS, _follow_up_prompt(risk_title, conversation_history), Priority.FOLLOW_UP)
+        return _parse_follow_up_questions(response.content)
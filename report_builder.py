@@ -0,0 +1,150 @@
+"""
+리스크 보고서 생성: Top 5 리스크 전체에 대한 3개 페르소나 분석을 병렬로 생성하여 DOCX로 저장
+"""
+import io
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Pt
+
+from llm_gateway import Priority, track_execution
+from rag_engine import answer_query
+
+# 보고서용 질문 (리스크마다 동일하게 사용)
+REPORT_QUESTION = "이 리스크의 발생 경위와 쟁점을 분석하고, 각 당사자의 대응 전략과 예상 판정을 제시해주세요."
+
+# 동시에 생성하는 리스크 수 (실제 호출 수는 LLM 게이트웨이가 추가로 제한)
+REPORT_WORKERS = 5
+
+_BOLD_PATTERN = re.compile(r"\*\*(.+?)\*\*")
+
+
+def _add_markdown_paragraph(doc, line: str, style: Optional[str] = None):
+    """**굵게** 표기를 반영하여 문단을 추가합니다."""
+    paragraph = doc.add_paragraph(style=style)
+    position = 0
+    for match in _BOLD_PATTERN.finditer(line):
+        if match.start() > position:
+            paragraph.add_run(line[position:match.start()])
+        paragraph.add_run(match.group(1)).bold = True
+        position = match.end()
+    if position < len(line):
+        paragraph.add_run(line[position:])
+    return paragraph
+
+
+def _add_markdown(doc, text: str):
+    """LLM 답변(마크다운)을 제목/목록/문단으로 변환하여 추가합니다."""
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            doc.add_heading(line.lstrip("#").strip(), level=2)
+        elif line.startswith(("- ", "* ", "• ")):
+            _add_markdown_paragraph(doc, line[2:].strip(), style="List Bullet")
+        else:
+            _add_markdown_paragraph(doc, line)
+
+
+def build_risk_report(
+    engine,
+    risks: List[Dict[str, str]],
+    system_prompt: str,
+    persona_1_prompt: str,
+    persona_2_prompt: str,
+    persona_3_prompt: str,
+    on_section: Optional[Callable[[int, str], None]] = None,
+    max_workers: int = REPORT_WORKERS
+) -> Tuple[bytes, Dict[str, float]]:
+    """
+    모든 리스크에 대한 페르소나 분석을 동시에 생성하여 하나의 DOCX 보고서로 만듭니다.
+    검색은 한 번의 임베딩 호출로 묶어 처리하고, 답변은 RAG 엔진의 답변 캐시를 재사용합니다.
+    완료된 섹션은 앞 번호 섹션이 모두 끝나는 즉시 리스크 순서대로 문서에 추가됩니다.
+    Args:
+        engine: 문서가 적재된 RAGEngine
+        risks: [{"title": ..., "description": ...}, ...]
+        on_section: 섹션이 문서에 추가될 때마다 호출되는 콜백 (리스크 인덱스, 제목)
+    Returns:
+        (DOCX 바이트, {"wall_seconds", "sequential_seconds", "speedup"})
+        sequential_seconds는 검색 시간과 리스크별 LLM 실행 시간(게이트웨이 대기 제외)의 합으로 추정한 순차 생성 시간입니다.
+    """
+    started = time.perf_counter()
+
+    doc = Document()
+    style = doc.styles['Normal']
+    style.font.name = 'Malgun Gothic'
+    style.font.size = Pt(11)
+
+    title = doc.add_heading("클레임 리스크 종합 분석 보고서", level=0)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    doc.add_paragraph(f"작성일: {time.strftime('%Y. %m. %d.')}")
+    doc.add_heading("Risk Top 5 요약", level=1)
+    for i, risk in enumerate(risks):
+        _add_markdown_paragraph(doc, f"{i + 1}. **{risk['title']}**")
+
+    # 리스크별 검색을 한 번에 처리 (임베딩 1회 호출, 페르소나별 검색 결과의 합집합)
+    retrieval_started = time.perf_counter()
+    all_relevant_docs = engine.retrieve_many(
+        [answer_query(risk['title'], REPORT_QUESTION) for risk in risks]
+    )
+    retrieval_seconds = time.perf_counter() - retrieval_started
+
+    def analyze(index: int) -> Tuple[int, str, float]:
+        # 게이트웨이 대기 시간(형제 작업·다른 세션 뒤에서 기다린 시간)을 뺀 LLM 실행 시간만 측정
+        with track_execution() as timing:
+            answer = engine.generate_answer(
+                question=REPORT_QUESTION,
+                risk_title=risks[index]['title'],
+                system_prompt=system_prompt,
+                persona_1_prompt=persona_1_prompt,
+                persona_2_prompt=persona_2_prompt,
+                persona_3_prompt=persona_3_prompt,
+                relevant_docs=all_relevant_docs[index],
+                priority=Priority.BATCH
+            )
+        return index, answer, timing["seconds"]
+
+    sequential_seconds = retrieval_seconds
+    completed = {}
+    next_index = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(analyze, i) for i in range(len(risks))]
+        for future in as_completed(futures):
+            index, answer, elapsed = future.result()
+            sequential_seconds += elapsed
+            completed[index] = answer
+
+            # 순서가 이어지는 섹션부터 문서에 추가
+            while next_index in completed:
+                risk = risks[next_index]
+                doc.add_page_break()
+                doc.add_heading(f"Risk {next_index + 1}. {risk['title']}", level=1)
+                if risk.get('description'):
+                    _add_markdown(doc, risk['description'])
+                _add_markdown(doc, completed.pop(next_index))
+                if on_section:
+                    on_section(next_index, risk['title'])
+                next_index += 1
+
+    wall_seconds = time.perf_counter() - started
+    stats = {
+        "wall_seconds": wall_seconds,
+        "sequential_seconds": sequential_seconds,
+        "speedup": sequential_seconds / wall_seconds if wall_seconds else 0.0,
+    }
+
+    doc.add_page_break()
+    doc.add_heading("보고서 생성 정보", level=1)
+    doc.add_paragraph(
+        f"생성 시간 {stats['wall_seconds']:.1f}초 "
+        f"(순차 생성 추정 {stats['sequential_seconds']:.1f}초 = 검색 + LLM 실행 시간 합계, {stats['speedup']:.1f}배)"
+    )
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue(), stats
@@ -0,0 +1,140 @@
+"""
+세션 상태 관리: 문서 핸들, 유휴 세션 정리, 세션별 메모리 추정
+"""
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, fields, is_dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from extraction_cache import ExtractionCache, get_extraction_cache
+
+# 이 시간(초) 동안 활동이 없는 세션의 문서/분석 상태를 해제합니다.
+SESSION_IDLE_TTL_SECONDS = int(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800"))
+
+ERROR_TEXT = "Error reading file."
+
+
+class DocumentUnavailableError(RuntimeError):
+    """문서 핸들의 추출 텍스트를 캐시에서 읽을 수 없을 때 발생"""
+
+
+@dataclass(frozen=True)
+class DocumentHandle:
+    """
+    세션에 보관하는 업로드 문서 정보 (텍스트는 보관하지 않음)
+    본문은 필요할 때 추출 캐시에서 content_hash로 읽어옵니다.
+    """
+    category: str
+    filename: str
+    content_hash: Optional[str]  # 추출 실패 시 None
+    size_bytes: int              # 업로드 파일 크기
+    text_chars: int              # 추출된 텍스트 길이
+    num_segments: int
+
+    def iter_segments(self, cache: Optional[ExtractionCache] = None) -> Iterator[Tuple[Dict[str, Any], str]]:
+        """
+        추출된 구간을 캐시에서 하나씩 읽어옵니다.
+        핸들이 살아 있는 동안 캐시 항목은 고정(pin)되지만, 캐시 폴더가 외부에서 삭제된 경우 등에는
+        DocumentUnavailableError가 발생합니다.
+        """
+        if self.content_hash is None:
+            yield {}, ERROR_TEXT
+            return
+        cache = cache or get_extraction_cache()
+        try:
+            yield from cache.iter_segments(self.content_hash)
+        except KeyError:
+            raise DocumentUnavailableError(
+                f"'{self.filename}'의 추출 텍스트를 찾을 수 없습니다. 파일을 다시 업로드한 뒤 분석해주세요."
+            )
+
+    def release(self, cache: Optional[ExtractionCache] = None):
+        """더 이상 사용하지 않는 핸들의 캐시 고정 해제 (extract_document가 고정한 항목)"""
+        if self.content_hash is not None:
+            (cache or get_extraction_cache()).unpin(self.content_hash)
+
+
+def release_documents(documents: Iterable[Any], cache: Optional[ExtractionCache] = None):
+    """세션에서 내려놓는 문서 핸들들의 캐시 고정 해제"""
+    for document in documents:
+        if isinstance(document, DocumentHandle):
+            document.release(cache)
+
+
+def estimate_size(value: Any, _seen: Optional[set] = None) -> int:
+    """
+    컨테이너를 따라가며 객체의 대략적인 메모리 사용량(바이트)을 추정합니다.
+    (외부 라이브러리 객체는 내부까지 따라가지 않습니다)
+    """
+    seen = _seen if _seen is not None else set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, seen) + estimate_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, seen) for item in value)
+    elif is_dataclass(value):
+        size += sum(estimate_size(getattr(value, field.name), seen) for field in fields(value))
+    return size
+
+
+def estimate_session_bytes(state: Any, skip: Tuple[str, ...] = ("rag_engine",)) -> int:
+    """세션 상태 값들의 메모리 사용량 추정 (공유 자원인 RAG 엔진 등은 제외)"""
+    return sum(estimate_size(state[key]) for key in list(state.keys()) if key not in skip)
+
+
+class SessionRegistry:
+    """
+    프로세스 내 세션들의 마지막 활동 시각을 추적하고, 유휴 세션의 상태를 해제합니다.
+    각 세션은 자신의 상태를 비우는 release 콜백을 등록합니다.
+    """
+
+    def __init__(self, idle_ttl_seconds: int = SESSION_IDLE_TTL_SECONDS):
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._sessions: Dict[str, Tuple[float, Callable[[], None]]] = {}
+        self._lock = threading.Lock()
+
+    def touch(self, session_id: str, release: Callable[[], None]):
+        """세션 활동 기록"""
+        with self._lock:
+            self._sessions[session_id] = (time.monotonic(), release)
+
+    def evict_idle(self) -> int:
+        """
+        유휴 시간이 idle_ttl_seconds를 넘은 세션의 상태를 해제합니다.
+        Returns:
+            해제된 세션 수
+        """
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                (session_id, release)
+                for session_id, (last_active, release) in self._sessions.items()
+                if now - last_active > self.idle_ttl_seconds
+            ]
+            for session_id, _ in idle:
+                del self._sessions[session_id]
+
+        for session_id, release in idle:
+            try:
+                release()
+            except Exception as e:
+                print(f"Error releasing session {session_id}: {e}")
+        return len(idle)
+
+    def active_sessions(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+_registry = SessionRegistry()
+
+
+def get_session_registry() -> SessionRegistry:
+    """프로세스 전역 세션 레지스트리를 반환합니다."""
+    return _registry
@@ -0,0 +1,48 @@
+from datetime import date
+
+import pytest
+
+from timeline_index import TimelineIndex, _find_dates, extract_events
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("2024. 7. 11.(목) ~ 2024. 7. 15.(월) 공사 중지", (date(2024, 7, 11), date(2024, 7, 15))),
+    ("2024년 7월 11일부터 2024년 7월 15일까지 공사 중지", (date(2024, 7, 11), date(2024, 7, 15))),
+    ("7월 11일부터 7월 15일까지 공사 중지", (date(2024, 7, 11), date(2024, 7, 15))),
+    ("2024년 7월 11일 ~ 15일 공사 중지", (date(2024, 7, 11), date(2024, 7, 15))),
+    ("7/11~7/13 우천 작업중지", (date(2024, 7, 11), date(2024, 7, 13))),
+    ("07.11–07.15 공사 중지", (date(2024, 7, 11), date(2024, 7, 15))),
+    ("7월 11일(목) ~ 7월 15일(월) 공사 중지", (date(2024, 7, 11), date(2024, 7, 15))),
+])
+def test_find_dates_ranges(line, expected):
+    intervals, _, _ = _find_dates(line, 2024)
+    assert intervals == [expected]
+
+
+def test_find_dates_single_date_with_weekday():
+    intervals, spans, year = _find_dates("2024. 7. 11.(목) 작업 내용", None)
+    assert intervals == [(date(2024, 7, 11), date(2024, 7, 11))]
+    assert spans == [(0, len("2024. 7. 11.(목)"))]
+    assert year == 2024
+
+
+def test_duration_after_start_date_is_not_an_end_day():
+    events = extract_events("7월 11일부터 15일간 공사 중지", {"filename": "공문.pdf"}, default_year=2024)
+    assert events[0]["start_date"] == "2024-07-11"
+    assert events[0]["days"] == 15
+
+
+def test_slash_outside_month_day_range_is_not_a_date():
+    intervals, _, _ = _find_dates("공정률 3/40 및 13/5 구간", 2024)
+    assert intervals == []
+
+
+@pytest.mark.parametrize("line", [
+    "2024. 7. 11.(목) ~ 2024. 7. 15.(월) 공사 중지",
+    "7월 11일부터 7월 15일까지 공사 중지",
+    "2024년 7월 11일 ~ 15일 공사 중지",
+])
+def test_total_days_counts_whole_range(line):
+    timeline = TimelineIndex(":memory:")
+    timeline.add_chunks(["chunk-1"], [line], [{"category": "공문서", "filename": "공문_2024.pdf"}])
+    assert timeline.total_days()["days"] == 5
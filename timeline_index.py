@@ -0,0 +1,426 @@
+"""
+타임라인 인덱스: 적재 시 청크에서 날짜·기간·금액·문서번호를 추출하여 SQLite에 저장하고
+공사 중지 일수, 지연 사건 중첩 등 날짜 계산 질의를 LLM 호출 없이 처리합니다.
+"""
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 사건 유형 판별 키워드 (앞에 있을수록 우선, 구체적인 사유를 먼저 확인)
+EVENT_KIND_KEYWORDS = [
+    ("우천", ("우천", "호우", "강우", "폭우")),
+    ("파업", ("파업",)),
+    ("공사중지", ("중지", "중단")),
+    ("공기연장", ("연장",)),
+    ("지연", ("지연", "지체")),
+    ("설계변경", ("설계 변경", "설계변경")),
+]
+
+# 공사 중지 일수 합산에 포함하는 사건 유형
+STOPPAGE_KINDS = ("공사중지", "우천", "파업")
+
+# 공기 지연 관련 사건 유형 (중첩 분석 대상)
+DELAY_KINDS = ("공사중지", "우천", "파업", "공기연장", "지연")
+
+DOCUMENT_DATE_KIND = "문서일자"
+
+# 날짜 뒤의 요일 표기 (예: 2024. 7. 11.(목))
+_WEEKDAY = r"(?:\s*\(\s*[월화수목금토일](?:요일)?\s*\))?"
+# 기간 구분자 (~, –, -, "부터 … 까지")
+_SEPARATOR = r"(?:[~∼〜–\-]|부터)"
+_DATE_PATTERN = re.compile(
+    r"(?:(?P<y>\d{4})\s*[.\-/년]\s*(?P<m>\d{1,2})\s*[.\-/월]\s*(?P<d>\d{1,2})(?:\s*일|\s*\.)?"
+    r"|(?P<m2>\d{1,2})\s*월\s*(?P<d2>\d{1,2})\s*일"
+    # 연도 없는 "MM.DD"는 기간의 시작일일 때만 날짜로 인정 (예: 07.11–07.15, 소수와 구분)
+    r"|(?<![\d.])(?P<m3>\d{1,2})\s*\.\s*(?P<d3>\d{2})"
+    r"(?=" + _WEEKDAY + r"\s*" + _SEPARATOR + r"\s*\d{1,2}\s*(?:\.\s*\d{2}|월|일))"
+    # 연도 없는 "M/D" (예: 7/11~7/13, 분수와 구분하도록 월·일 범위만 인정)
+    r"|(?<![\d/.])(?P<m4>1[0-2]|0?[1-9])/(?P<d4>3[01]|[12]\d|0?[1-9])(?![\d/])"
+    r")" + _WEEKDAY
+)
+_SHORT_DATE_PATTERN = re.compile(r"(?P<m>\d{1,2})\s*\.\s*(?P<d>\d{1,2})(?:\s*\.)?" + _WEEKDAY)
+# 기간 끝의 일(日)만 있는 표기 (예: 7월 11일 ~ 15일, "15일간" 같은 기간 표현은 제외)
+_DAY_ONLY_PATTERN = re.compile(r"(?P<d>\d{1,2})\s*일(?!\s*(?:간|동안|이내))" + _WEEKDAY)
+_RANGE_SEPARATOR = re.compile(r"\s*" + _SEPARATOR + r"\s*")
+_RANGE_END = re.compile(r"\s*까지")
+_YEAR_IN_NAME_PATTERN = re.compile(r"(?<!\d)(20\d{2})(?!\d)")
+_DURATION_PATTERN = re.compile(r"(\d+)\s*일\s*(?:간|동안|연장|지연|소요|중지)")
+_AMOUNT_PATTERN = re.compile(
+    r"(?P<amount>(?:\d[\d,]*(?:\.\d+)?\s*(?:조|억|천만|백만|만)\s*)*\d[\d,]*(?:\.\d+)?\s*(?:조|억|천만|백만|만)?)\s*원(?!도급)"
+)
+_AMOUNT_PART_PATTERN = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*(조|억|천만|백만|만)?")
+_AMOUNT_UNITS = {"조": 10**12, "억": 10**8, "천만": 10**7, "백만": 10**6, "만": 10**4, None: 1}
+_DOC_NUMBER_PATTERN = re.compile(r"문서\s*번호\s*[:：]?\s*([A-Za-z0-9가-힣][A-Za-z0-9가-힣\-_/]*)")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    chunk_id TEXT,
+    category TEXT,
+    filename TEXT,
+    page INTEGER,
+    kind TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    days INTEGER,
+    amount_won INTEGER,
+    doc_number TEXT,
+    snippet TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_events_unique ON events(filename, snippet, IFNULL(start_date, ''));
+CREATE INDEX IF NOT EXISTS idx_events_kind_dates ON events(kind, start_date, end_date);
+CREATE INDEX IF NOT EXISTS idx_events_dates ON events(start_date, end_date);
+CREATE INDEX IF NOT EXISTS idx_events_doc_number ON events(doc_number);
+"""
+
+
+def _to_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _parse_amount(text: str) -> int:
+    """'3억 5천만' 형태의 금액 문자열을 원 단위 정수로 변환합니다."""
+    total = 0
+    for number, unit in _AMOUNT_PART_PATTERN.findall(text):
+        total += float(number.replace(",", "")) * _AMOUNT_UNITS[unit or None]
+    return int(total)
+
+
+def _detect_kind(text: str) -> Optional[str]:
+    for kind, keywords in EVENT_KIND_KEYWORDS:
+        if any(keyword in text for keyword in keywords):
+            return kind
+    return None
+
+
+def _month_day(match: re.Match) -> Tuple[int, int]:
+    """연도 없는 날짜 표기(M월 D일, MM.DD, M/D)의 (월, 일)"""
+    for month_group, day_group in (("m2", "d2"), ("m3", "d3"), ("m4", "d4")):
+        if match.group(month_group):
+            return int(match.group(month_group)), int(match.group(day_group))
+    return int(match.group("m")), int(match.group("d"))
+
+
+def _find_dates(line: str, default_year: Optional[int]) -> Tuple[List[Tuple[date, date]], List[Tuple[int, int]], Optional[int]]:
+    """
+    한 줄에서 날짜와 기간(~, 부터…까지)을 찾습니다. 연도가 없는 날짜는 default_year를 사용합니다.
+    Returns:
+        ([(시작일, 종료일), ...], 날짜가 차지한 문자 구간 리스트, 마지막으로 확인된 연도)
+    """
+    intervals = []
+    spans = []
+    position = 0
+    while True:
+        match = _DATE_PATTERN.search(line, position)
+        if not match:
+            break
+        if match.group("y"):
+            default_year = int(match.group("y"))
+            start = _to_date(default_year, int(match.group("m")), int(match.group("d")))
+        elif default_year:
+            start = _to_date(default_year, *_month_day(match))
+        else:
+            start = None
+        span_end = match.end()
+
+        # "시작일 ~ 종료일", "시작일부터 종료일까지" 형태의 기간
+        end = start
+        separator = _RANGE_SEPARATOR.match(line, span_end)
+        if start and separator:
+            tail = _DATE_PATTERN.match(line, separator.end())
+            short = _SHORT_DATE_PATTERN.match(line, separator.end())
+            day_only = _DAY_ONLY_PATTERN.match(line, separator.end())
+            if tail and tail.group("y"):
+                end = _to_date(int(tail.group("y")), int(tail.group("m")), int(tail.group("d")))
+                span_end = tail.end()
+            elif tail:
+                end = _to_date(start.year, *_month_day(tail))
+                span_end = tail.end()
+            elif short:
+                end = _to_date(start.year, int(short.group("m")), int(short.group("d")))
+                span_end = short.end()
+            elif day_only:
+                end = _to_date(start.year, start.month, int(day_only.group("d")))
+                span_end = day_only.end()
+            range_end = _RANGE_END.match(line, span_end)
+            if span_end != match.end() and range_end:
+                span_end = range_end.end()
+            if end is None or end < start:
+                end = start
+
+        if start:
+            intervals.append((start, end))
+        spans.append((match.start(), span_end))
+        position = span_end
+    return intervals, spans, default_year
+
+
+def year_from_filename(filename: str) -> Optional[int]:
+    """파일명에 포함된 연도 (예: 작업일보_2024-07.pdf → 2024)"""
+    match = _YEAR_IN_NAME_PATTERN.search(filename or "")
+    return int(match.group(1)) if match else None
+
+
+def extract_events(text: str, metadata: Dict[str, Any], default_year: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    청크 텍스트에서 날짜가 있는 사건, 기간, 금액, 문서번호를 추출합니다.
+    Args:
+        text: 청크 텍스트
+        metadata: 청크 메타데이터 (category, filename, page 등)
+        default_year: 연도 없는 날짜(7월 11일, 07.11–07.15)에 사용할 연도 (같은 문서의 앞 청크에서 확인된 연도 등)
+    Returns:
+        events 테이블 행 dict 리스트
+    """
+    category = metadata.get("category", "")
+    chunk_kind = _detect_kind(text)
+    doc_number_match = _DOC_NUMBER_PATTERN.search(text)
+    doc_number = doc_number_match.group(1) if doc_number_match else None
+
+    events = []
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+
+        intervals, spans, default_year = _find_dates(line, default_year)
+
+        # 날짜 부분을 지운 뒤 기간(N일간)과 금액 검색 ("7월 11일"의 "11일"을 기간으로 오인하지 않도록)
+        remainder = line
+        for start, end in spans:
+            remainder = remainder[:start] + " " * (end - start) + remainder[end:]
+        duration = _DURATION_PATTERN.search(remainder)
+        amount = _AMOUNT_PATTERN.search(remainder)
+
+        if not intervals and not duration and not amount:
+            continue
+
+        line_kind = _detect_kind(line)
+        is_range = any(start != end for start, end in intervals)
+        if line_kind:
+            kind = line_kind
+        elif is_range or duration:
+            kind = chunk_kind or "기타"
+        elif intervals and category == "작업일보" and chunk_kind in STOPPAGE_KINDS:
+            # 작업일보의 날짜 줄은 그날의 작업 중지 기록
+            kind = chunk_kind
+        elif intervals:
+            kind = DOCUMENT_DATE_KIND
+        else:
+            kind = chunk_kind or "기타"
+
+        base = {
+            "category": category,
+            "filename": metadata.get("filename", ""),
+            "page": metadata.get("page"),
+            "kind": kind,
+            "amount_won": _parse_amount(amount.group("amount")) if amount else None,
+            "doc_number": doc_number,
+            "snippet": line[:200],
+        }
+        if intervals:
+            for start, end in intervals:
+                days = int(duration.group(1)) if duration else (end - start).days + 1
+                events.append({**base, "start_date": start.isoformat(), "end_date": end.isoformat(), "days": days})
+        else:
+            days = int(duration.group(1)) if duration else None
+            events.append({**base, "start_date": None, "end_date": None, "days": days})
+    return events
+
+
+class TimelineIndex:
+    """청크에서 추출한 사건을 저장하고 날짜 계산 질의를 처리하는 SQLite 인덱스"""
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        # 연도 없는 날짜 해석용: 파일별 마지막으로 확인된 연도, 프로젝트 전체에서 마지막으로 확인된 연도
+        self._document_years: Dict[str, int] = {}
+        self._last_year: Optional[int] = None
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+
+    def reset(self):
+        """모든 사건 삭제"""
+        with self._lock:
+            self._conn.execute("DELETE FROM events")
+            self._conn.commit()
+            self._document_years.clear()
+            self._last_year = None
+
+    def _default_year(self, filename: str) -> Optional[int]:
+        """같은 파일의 앞 청크 → 파일명 → 다른 문서 순서로 연도를 추정합니다."""
+        return self._document_years.get(filename) or year_from_filename(filename) or self._last_year
+
+    def add_chunks(self, chunk_ids: Iterable[str], chunks: Iterable[str], metadatas: Iterable[Dict[str, Any]]) -> int:
+        """
+        청크 배치에서 사건을 추출하여 저장합니다. (청크 겹침으로 인한 중복 문장은 한 번만 저장)
+        청크는 문서 순서대로 전달되어야 연도 없는 날짜에 앞 청크의 연도를 이어서 적용할 수 있습니다.
+        Returns:
+            새로 저장된 사건 수
+        """
+        rows = []
+        for chunk_id, chunk, metadata in zip(chunk_ids, chunks, metadatas):
+            filename = metadata.get("filename", "")
+            events = extract_events(chunk, metadata, self._default_year(filename))
+            dated = [event["start_date"] for event in events if event["start_date"]]
+            if dated:
+                year = int(dated[-1][:4])
+                self._document_years[filename] = year
+                self._last_year = year
+            rows.extend({**event, "chunk_id": chunk_id} for event in events)
+        if not rows:
+            return 0
+
+        with self._lock:
+            changes_before = self._conn.total_changes
+            self._conn.executemany(
+                """INSERT OR IGNORE INTO events
+                   (chunk_id, category, filename, page, kind, start_date, end_date, days, amount_won, doc_number, snippet)
+                   VALUES (:chunk_id, :category, :filename, :page, :kind, :start_date, :end_date, :days, :amount_won, :doc_number, :snippet)""",
+                rows
+            )
+            inserted = self._conn.total_changes - changes_before
+            self._conn.commit()
+        return inserted
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def events(
+        self,
+        kinds: Optional[Iterable[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        사건 조회 (날짜순)
+        Args:
+            kinds: 사건 유형 필터 (예: ["공사중지", "우천"])
+            start, end: 이 기간(YYYY-MM-DD)과 겹치는 사건만 조회
+        """
+        query = "SELECT * FROM events WHERE 1=1"
+        params: List[Any] = []
+        if kinds:
+            kinds = list(kinds)
+            query += f" AND kind IN ({','.join('?' * len(kinds))})"
+            params += kinds
+        if start:
+            query += " AND end_date >= ?"
+            params.append(start)
+        if end:
+            query += " AND start_date <= ?"
+            params.append(end)
+        query += " ORDER BY start_date IS NULL, start_date, end_date"
+
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params)]
+
+    def total_days(self, kinds: Iterable[str] = STOPPAGE_KINDS) -> Dict[str, Any]:
+        """
+        지정한 유형 사건의 기간을 합산합니다. 겹치는 기간은 한 번만 셉니다.
+        (예: 공사 중지 07.11~07.15와 우천 작업중지 07.12 → 5일)
+        Returns:
+            {"days": 합산 일수, "periods": [(시작일, 종료일), ...]}
+        """
+        periods = []
+        for event in self.events(kinds=kinds):
+            if not event["start_date"]:
+                continue
+            start = date.fromisoformat(event["start_date"])
+            end = date.fromisoformat(event["end_date"])
+            if periods and start <= periods[-1][1] + timedelta(days=1):
+                periods[-1] = (periods[-1][0], max(periods[-1][1], end))
+            else:
+                periods.append((start, end))
+
+        days = sum((end - start).days + 1 for start, end in periods)
+        return {"days": days, "periods": [(start.isoformat(), end.isoformat()) for start, end in periods]}
+
+    def overlapping_events(self, kinds: Iterable[str] = DELAY_KINDS) -> List[Dict[str, Any]]:
+        """
+        서로 다른 문서에서 기간이 겹치는 사건 쌍을 조회합니다. (동시 발생 지연 분석용)
+        Returns:
+            [{"first": 사건, "second": 사건, "overlap_start", "overlap_end", "overlap_days"}, ...]
+        """
+        kinds = list(kinds)
+        placeholders = ",".join("?" * len(kinds))
+        query = f"""
+            SELECT a.id AS a_id, b.id AS b_id,
+                   MAX(a.start_date, b.start_date) AS overlap_start,
+                   MIN(a.end_date, b.end_date) AS overlap_end
+            FROM events a JOIN events b
+              ON a.id < b.id
+             AND a.filename != b.filename
+             AND a.start_date <= b.end_date
+             AND b.start_date <= a.end_date
+            WHERE a.kind IN ({placeholders}) AND b.kind IN ({placeholders})
+            ORDER BY overlap_start
+        """
+        with self._lock:
+            pairs = self._conn.execute(query, kinds + kinds).fetchall()
+            if not pairs:
+                return []
+            ids = {row["a_id"] for row in pairs} | {row["b_id"] for row in pairs}
+            events = {
+                row["id"]: dict(row)
+                for row in self._conn.execute(
+                    f"SELECT * FROM events WHERE id IN ({','.join('?' * len(ids))})", list(ids)
+                )
+            }
+
+        overlaps = []
+        for row in pairs:
+            overlap_start = date.fromisoformat(row["overlap_start"])
+            overlap_end = date.fromisoformat(row["overlap_end"])
+            overlaps.append({
+                "first": events[row["a_id"]],
+                "second": events[row["b_id"]],
+                "overlap_start": row["overlap_start"],
+                "overlap_end": row["overlap_end"],
+                "overlap_days": (overlap_end - overlap_start).days + 1,
+            })
+        return overlaps
+
+    def summary_context(self, max_events: int = 20) -> str:
+        """
+        답변 생성 프롬프트에 넣을 간결한 타임라인 요약 (사건이 없으면 빈 문자열)
+        """
+        events = [event for event in self.events() if event["kind"] != DOCUMENT_DATE_KIND]
+        if not events:
+            return ""
+
+        lines = []
+        for event in events[:max_events]:
+            if event["start_date"]:
+                period = event["start_date"] if event["start_date"] == event["end_date"] else f"{event['start_date']}~{event['end_date']}"
+            else:
+                period = "날짜 미상"
+            details = []
+            if event["days"]:
+                details.append(f"{event['days']}일")
+            if event["amount_won"]:
+                details.append(f"{event['amount_won']:,}원")
+            if event["doc_number"]:
+                details.append(f"문서번호 {event['doc_number']}")
+            detail_text = f" ({', '.join(details)})" if details else ""
+            lines.append(f"- {period} [{event['kind']}] {event['filename']}{detail_text}: {event['snippet'][:80]}")
+
+        stoppage = self.total_days()
+        if stoppage["days"]:
+            lines.append(f"- 공사 중지 일수 합계(중복 제외): {stoppage['days']}일")
+        for overlap in self.overlapping_events()[:5]:
+            lines.append(
+                f"- 기간 중첩: {overlap['first']['filename']} [{overlap['first']['kind']}] ↔ "
+                f"{overlap['second']['filename']} [{overlap['second']['kind']}] "
+                f"{overlap['overlap_start']}~{overlap['overlap_end']} ({overlap['overlap_days']}일)"
+            )
+        return "\n".join(lines)
@@ -1,57 +1,311 @@
 import os
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, UnstructuredExcelLoader
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from langchain_community.document_loaders import Docx2txtLoader, UnstructuredExcelLoader
+from extraction_cache import get_extraction_cache
+from session_store import DocumentHandle, ERROR_TEXT
+
+# PDF 병렬 추출 설정
+PDF_PAGES_PER_TASK = 16      # 워커 하나가 한 번에 처리하는 페이지 수
+PDF_PARALLEL_MIN_PAGES = 32  # 이보다 적은 페이지는 단일 프로세스로 처리
+
+# 엑셀 추출 설정
+EXCEL_ROWS_PER_GROUP = 50    # 하나의 구간으로 묶을 행 수
+
+
+def _extract_pdf_page_range(file_path, start, end):
+    """
+    PDF의 [start, end) 페이지 범위에서 텍스트를 추출합니다. (워커 프로세스용)
+    반환값: [(페이지 번호(1부터 시작), 텍스트), ...]
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    pages = []
+    for index in range(start, end):
+        try:
+            text = reader.pages[index].extract_text() or ""
+        except Exception as e:
+            print(f"Error reading page {index + 1} of {file_path}: {e}")
+            text = ""
+        pages.append((index + 1, text))
+    return pages
+
+
+def iter_pdf_pages(file_path, max_workers=None, pages_per_task=PDF_PAGES_PER_TASK):
+    """
+    PDF를 페이지 단위로 추출하는 제너레이터입니다.
+    페이지 범위를 워커 프로세스에 나누어 병렬로 파싱하고, 페이지 순서대로 내보냅니다.
+    동시에 처리 중인 범위는 워커 수의 2배로 제한되므로 메모리 사용량이 문서 크기에 비례하지 않습니다.
+    yield: ({"page": 페이지 번호}, 텍스트)
+    """
+    from pypdf import PdfReader
+
+    total_pages = len(PdfReader(file_path).pages)
+
+    # 작은 문서는 프로세스 생성 비용이 더 크므로 직접 처리
+    if total_pages < PDF_PARALLEL_MIN_PAGES:
+        for page, text in _extract_pdf_page_range(file_path, 0, total_pages):
+            yield {"page": page}, text
+        return
+
+    ranges = deque(
+        (start, min(start + pages_per_task, total_pages))
+        for start in range(0, total_pages, pages_per_task)
+    )
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_workers * 2
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+        while ranges or in_flight:
+            # 처리 중인 범위가 한도에 도달할 때까지 제출
+            while ranges and len(in_flight) < max_in_flight:
+                start, end = ranges.popleft()
+                in_flight.append(executor.submit(_extract_pdf_page_range, file_path, start, end))
+
+            # 가장 앞선 범위부터 순서대로 내보냄
+            for page, text in in_flight.popleft().result():
+                yield {"page": page}, text
+
+
+def _format_cell(value):
+    """엑셀 셀 값을 문자열로 변환합니다. (날짜는 YYYY-MM-DD)"""
+    if value is None:
+        return ""
+    if hasattr(value, "strftime"):
+        if getattr(value, "hour", 0) or getattr(value, "minute", 0):
+            return value.strftime("%Y-%m-%d %H:%M")
+        return value.strftime("%Y-%m-%d")
+    return str(value).strip()
+
+
+def iter_excel_row_groups(file_path, rows_per_group=EXCEL_ROWS_PER_GROUP):
+    """
+    openpyxl 읽기 전용(스트리밍) 모드로 엑셀(.xlsx)을 읽어 행 묶음 단위로 내보내는 제너레이터입니다.
+    각 시트의 첫 번째 비어있지 않은 행을 머리글로 보고, 이후 행을 "머리글: 값" 형태로 변환합니다.
+    한 번에 한 행 묶음만 메모리에 유지합니다.
+    yield: ({"sheet": 시트명, "row_start": 시작 행, "row_end": 끝 행, "header": 머리글}, 텍스트)
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            header = None
+            lines = []
+            row_start = None
+            row_end = None
+
+            for row_number, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+                cells = [_format_cell(value) for value in row]
+                if not any(cells):
+                    continue
+
+                if header is None:
+                    header = [cell or f"열{i + 1}" for i, cell in enumerate(cells)]
+                    continue
+
+                pairs = [f"{header[i] if i < len(header) else f'열{i + 1}'}: {cell}" for i, cell in enumerate(cells) if cell]
+                lines.append(f"[{row_number}행] " + ", ".join(pairs))
+                row_start = row_start or row_number
+                row_end = row_number
+
+                if len(lines) >= rows_per_group:
+                    yield _excel_group_metadata(sheet.title, row_start, row_end, header), "\n".join(lines)
+                    lines = []
+                    row_start = None
+
+            if lines:
+                yield _excel_group_metadata(sheet.title, row_start, row_end, header), "\n".join(lines)
+    finally:
+        workbook.close()
+
+
+def _excel_group_metadata(sheet_name, row_start, row_end, header):
+    """엑셀 행 묶음의 구간 메타데이터를 생성합니다."""
+    return {
+        "sheet": sheet_name,
+        "row_start": row_start,
+        "row_end": row_end,
+        "header": " | ".join(header),
+    }
+
+
+def iter_file_segments(file_path, filename):
+    """
+    저장된 파일에서 텍스트를 구간(세그먼트) 단위로 추출하는 제너레이터입니다.
+    PDF는 페이지 단위로, 엑셀(.xlsx)은 시트별 행 묶음 단위로, 그 외 형식은 파일 전체를 하나의 구간으로 내보냅니다.
+    yield: (구간 메타데이터 dict, 텍스트)
+    """
+    ext = os.path.splitext(filename)[1].lower()
+
+    if ext == ".pdf":
+        yield from iter_pdf_pages(file_path)
+
+    elif ext in [".docx", ".doc"]:
+        loader = Docx2txtLoader(file_path)
+        docs = loader.load()
+        yield {}, "\n".join([d.page_content for d in docs])
+
+    elif ext == ".xlsx":
+        yield from iter_excel_row_groups(file_path)
+
+    elif ext == ".xls":
+        # openpyxl은 구형 .xls 형식을 지원하지 않으므로 기존 로더 사용
+        loader = UnstructuredExcelLoader(file_path)
+        docs = loader.load()
+        yield {}, "\n".join([d.page_content for d in docs])
+
+    elif ext == ".txt":
+        # txt 파일은 그냥 읽기
+        with open(file_path, "r", encoding="utf-8") as f:
+            yield {}, f.read()
+
+
+def _ensure_extracted(data, filename, cache):
+    """
+    파일 바이트의 추출 결과가 캐시에 있는지 확인하고, 없으면 추출하여 저장합니다.
+    반환값: 캐시 키 (추출 실패 시 None)
+    """
+    key = cache.key_for(data)
+
+    if not cache.has(key):
+        # 파서가 읽을 수 있도록 캐시 임시 폴더에 저장 후 추출
+        file_path = cache.scratch_file(data, os.path.splitext(filename)[1].lower())
+        try:
+            cache.put(key, iter_file_segments(file_path, filename))
+        except Exception as e:
+            print(f"Error reading file {filename}: {e}")
+            return None
+        finally:
+            os.remove(file_path)
+
+    return key
+
+
+def extract_segments_from_file(uploaded_file, filename, cache=None):
+    """
+    업로드된 파일 객체에서 텍스트를 구간 단위로 추출합니다.
+    같은 내용의 파일이 이미 추출된 적이 있으면 파싱 없이 캐시에서 읽어옵니다.
+    반환값: [(구간 메타데이터 dict, 텍스트), ...]
+    """
+    cache = cache or get_extraction_cache()
+    data = bytes(uploaded_file.getbuffer())
+
+    # 다른 세션의 용량 정리로 읽기 전에 삭제된 경우 한 번만 다시 추출
+    for _ in range(2):
+        key = _ensure_extracted(data, filename, cache)
+        if key is None:
+            break
+        try:
+            return list(cache.iter_segments(key))
+        except KeyError:
+            continue
+
+    return [({}, ERROR_TEXT)]
+
+
+def extract_document(uploaded_file, filename, category, cache=None):
+    """
+    업로드된 파일을 추출하여 캐시에 저장하고, 텍스트 대신 문서 핸들을 반환합니다.
+    본문은 DocumentHandle.iter_segments()로 필요할 때 디스크에서 읽어옵니다.
+    캐시 항목은 고정되므로, 핸들을 더 이상 쓰지 않을 때 DocumentHandle.release()를 호출해야 합니다.
+    """
+    cache = cache or get_extraction_cache()
+    data = bytes(uploaded_file.getbuffer())
+
+    # 핸들이 살아 있는 동안 다른 세션의 업로드로 본문이 삭제되지 않도록 고정 (DocumentHandle.release()로 해제)
+    pinned_key = cache.key_for(data)
+    cache.pin(pinned_key)
+
+    key = None
+    text_chars = 0
+    num_segments = 0
+    # 고정 전에 다른 세션의 용량 정리로 삭제된 경우 한 번만 다시 추출
+    for _ in range(2):
+        key = _ensure_extracted(data, filename, cache)
+        if key is None:
+            break
+        try:
+            text_chars = 0
+            num_segments = 0
+            for _, text in cache.iter_segments(key):
+                text_chars += len(text)
+                num_segments += 1
+            break
+        except KeyError:
+            key = None
+
+    if key is None:
+        cache.unpin(pinned_key)
+
+    return DocumentHandle(
+        category=category,
+        filename=filename,
+        content_hash=key,
+        size_bytes=len(data),
+        text_chars=text_chars,
+        num_segments=num_segments
+    )
+
 
 def extract_text_from_file(uploaded_file, filename):
     """
     업로드된 파일 객체에서 텍스트를 추출합니다.
     """
-    # 임시 파일로 저장
-    temp_dir = "./temp_files"
-    if not os.path.exists(temp_dir):
-        os.makedirs(temp_dir)
-        
-    file_path = os.path.join(temp_dir, filename)
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    return segments_to_text(extract_segments_from_file(uploaded_file, filename))
+
+
+def segments_to_text(content):
+    """
+    문서 내용(문자열 또는 [(구간 메타데이터, 텍스트), ...])을 하나의 문자열로 합칩니다.
+    """
+    if isinstance(content, str):
+        return content
+    return "\n".join(text for _, text in content)
+
+
+def format_segment_location(metadata):
+    """
+    구간 메타데이터를 인용 표기용 문자열로 변환합니다. (예: "p. 213", "Sheet1 12-61행")
+    """
+    if metadata.get("page") is not None:
+        return f"p. {metadata['page']}"
+    if metadata.get("sheet") is not None:
+        return f"{metadata['sheet']} {metadata['row_start']}-{metadata['row_end']}행"
+    return ""
+
+
+def _head_text(content, max_chars):
+    """문서 내용의 앞부분 max_chars 글자만 읽어옵니다. (나머지 구간은 읽지 않음)"""
+    if isinstance(content, str):
+        return content[:max_chars]
+    if isinstance(content, DocumentHandle):
+        content = content.iter_segments()
+
+    parts = []
+    remaining = max_chars
+    for _, text in content:
+        if remaining <= 0:
+            break
+        parts.append(text[:remaining])
+        remaining -= len(parts[-1]) + 1
+    return "\n".join(parts)[:max_chars]
 
-    text = ""
-    try:
-        ext = os.path.splitext(filename)[1].lower()
-        
-        if ext == ".pdf":
-            loader = PyPDFLoader(file_path)
-            pages = loader.load()
-            text = "\n".join([p.page_content for p in pages])
-            
-        elif ext in [".docx", ".doc"]:
-            loader = Docx2txtLoader(file_path)
-            docs = loader.load()
-            text = "\n".join([d.page_content for d in docs])
-            
-        elif ext in [".xlsx", ".xls"]:
-            loader = UnstructuredExcelLoader(file_path)
-            docs = loader.load()
-            text = "\n".join([d.page_content for d in docs])
-            
-        elif ext == ".txt":
-            # txt 파일은 그냥 읽기
-            with open(file_path, "r", encoding="utf-8") as f:
-                text = f.read()
-                
-    except Exception as e:
-        print(f"Error reading file {filename}: {e}")
-        text = "Error reading file."
-        
-    return text
 
 def format_documents_for_prompt(documents):
     """
     프롬프트에 넣기 좋게 문서 내용을 하나의 문자열로 합칩니다.
-    documents: [(category, filename, text), ...]
+    documents: [(category, filename, text 또는 segments), ...] 또는 [DocumentHandle, ...]
     """
     formatted_text = ""
-    for category, filename, text in documents:
+    for document in documents:
+        if isinstance(document, DocumentHandle):
+            category, filename, content = document.category, document.filename, document
+        else:
+            category, filename, content = document
         formatted_text += f"\n[문서: {filename} ({category})]\n"
-        formatted_text += text[:2000] # 너무 길면 자름
+        formatted_text += _head_text(content, 2000) # 너무 길면 자름
         formatted_text += "\n" + "-"*50 + "\n"
-    return formatted_text
\ No newline at end of file
+    return formatted_text